@@ -0,0 +1,132 @@
+# Gemini text generation with a persistent response cache shared by every AI feature
+import hashlib
+import os
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import google.generativeai as genai
+
+from disk_cache import CACHE_ROOT, DiskCache
+
+DEFAULT_MODEL = 'gemini-1.5-pro-latest'
+
+# Cached answers expire after AI_CACHE_TTL_HOURS (default one week) and the cache is capped at
+# AI_CACHE_MAX_MB, least recently used answers evicted first
+AI_CACHE_TTL_HOURS = float(os.getenv("AI_CACHE_TTL_HOURS", "168"))
+AI_CACHE_MAX_MB = float(os.getenv("AI_CACHE_MAX_MB", "50"))
+ai_cache = DiskCache(CACHE_ROOT / "ai", max_bytes=int(AI_CACHE_MAX_MB * 2 ** 20),
+                     ttl=AI_CACHE_TTL_HOURS * 3600 if AI_CACHE_TTL_HOURS > 0 else None)
+
+# Most Gemini calls generate_many keeps in flight at once, on one pool shared by every session
+AI_MAX_CONCURRENT = int(os.getenv("AI_MAX_CONCURRENT", "4"))
+_executor = ThreadPoolExecutor(max_workers=max(AI_MAX_CONCURRENT, 1), thread_name_prefix="ai")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Whitespace-insensitive form of a prompt: indentation, runs of spaces and blank edges don't change the key."""
+    lines = (re.sub(r"[ \t]+", " ", line).strip() for line in prompt.replace("\r\n", "\n").split("\n"))
+    return "\n".join(lines).strip()
+
+
+def prompt_key(prompt: str, model_name: str = DEFAULT_MODEL) -> str:
+    """Cache key: SHA-256 of the model name and the normalized prompt."""
+    return hashlib.sha256(f"{model_name}\0{normalize_prompt(prompt)}".encode()).hexdigest()
+
+
+def generate_text(prompt: str, model_name: str = DEFAULT_MODEL, use_cache: bool = True) -> str:
+    """
+    Returns Gemini's response text for a prompt, from the cache when the same model was already
+    asked the same (normalized) prompt. API errors propagate to the caller; empty answers are not cached.
+    """
+    key = prompt_key(prompt, model_name)
+    if use_cache:
+        cached = ai_cache.get(key)
+        if cached is not None:
+            return cached
+
+    model = genai.GenerativeModel(model_name)
+    text = model.generate_content(prompt).text
+    if text and text.strip():
+        ai_cache.set(key, text)
+    return text
+
+
+def stream_text(prompt: str, model_name: str = DEFAULT_MODEL, use_cache: bool = True):
+    """
+    Yields Gemini's response text in chunks as it is generated (a cached answer arrives as one chunk).
+    The complete text is cached once the stream has been read to the end; API errors propagate.
+    """
+    key = prompt_key(prompt, model_name)
+    if use_cache:
+        cached = ai_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    model = genai.GenerativeModel(model_name)
+    parts = []
+    for chunk in model.generate_content(prompt, stream=True):
+        if not chunk.parts:  # e.g. a final chunk carrying only the finish reason
+            continue
+        parts.append(chunk.text)
+        yield chunk.text
+    text = "".join(parts)
+    if text.strip():
+        ai_cache.set(key, text)
+
+
+def generate_many(jobs: dict, on_done=None, on_chunk=None) -> dict:
+    """
+    Generates {name: prompt} (or {name: (prompt, model_name)}) concurrently and returns
+    {name: text, or the exception that call raised}. on_done(name, text, error) runs in the
+    calling thread as each answer arrives, fastest first, so a page can fill its sections in place.
+    With on_chunk, answers are streamed and on_chunk(name, text so far) runs after every chunk.
+
+    Calls run on the module's shared worker pool, so the caller never waits for them to wind
+    down: if a callback raises (e.g. a Streamlit rerun), streams stop at their next chunk and
+    the exception propagates at once.
+    """
+    results = {}
+    events = queue.Queue()
+    cancelled = threading.Event()
+
+    def run_one(name, job):
+        prompt, model_name = job if isinstance(job, tuple) else (job, DEFAULT_MODEL)
+        if cancelled.is_set():
+            return
+        try:
+            if on_chunk is not None:
+                parts = []
+                for chunk in stream_text(prompt, model_name):
+                    if cancelled.is_set():
+                        return
+                    parts.append(chunk)
+                    events.put(("chunk", name, "".join(parts), None))
+                text = "".join(parts)
+            else:
+                text = generate_text(prompt, model_name)
+            events.put(("done", name, text, None))
+        except Exception as e:
+            events.put(("done", name, None, e))
+
+    for name, job in jobs.items():
+        _executor.submit(run_one, name, job)
+    try:
+        while len(results) < len(jobs):
+            kind, name, text, error = events.get()
+            if kind == "chunk":
+                on_chunk(name, text)
+                continue
+            results[name] = text if error is None else error
+            if on_done is not None:
+                on_done(name, text, error)
+    finally:
+        cancelled.set()  # a callback raised: pending and streaming calls stop early
+    return results
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters of this process and the cache's current entry count and size."""
+    return ai_cache.stats()
@@ -6,15 +6,21 @@ from email.mime.text import MIMEText
 import smtplib
 from email.mime.base import MIMEBase
 from email import encoders
-from app_logic import process_payroll_report
-from email_handler import download_latest_attachment, download_latest_sales_report, generate_financial_summary_email, download_latest_menu_sales_report
+from app_logic import process_payroll_report, payroll_history, build_payroll_model, save_payroll_corrections
+from payroll_batch import run_batch, REPORTS_DIR
+from email_handler import download_latest_attachment, download_latest_sales_report, generate_financial_summary_email, download_latest_menu_sales_report, stored_latest_report
+from inbox_poller import start_inbox_poller
 from schedule_handler import download_latest_employee_schedule, parse_employee_schedule, generate_ai_schedule_changes, generate_formatted_excel_schedule
-from menu_handler import parse_menu_sales_report
+from menu_handler import parse_menu_sales_report, menu_analysis_prompt, calculate_metrics, extract_date_range, display_ai_analysis
+from sales_handler import load_sales_report, record_sales_history, history_cube, sales_history, refresh_sales_monitor
+from attachment_store import attachment_store
+from ai_client import generate_text, generate_many, stream_text, prompt_key, cache_stats as ai_cache_stats
 import pandas as pd
 from datetime import datetime
 from pathlib import Path
 from io import BytesIO
 import plotly.graph_objects as go # New import for Plotly
+from charts import daily_sales_figure, order_type_figure, line_trace
 import google.generativeai as genai
 from pages.accounting_assistant_page import accounting_assistant_page
 
@@ -25,6 +31,9 @@ genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
 st.set_page_config(page_title="Rosati's Executive Dashboard", layout="wide")
 
+# With INBOX_POLLER=1, emailed reports are fetched and parsed in the background, so pages open on the newest data
+start_inbox_poller()
+
 # Initialize session state variables if they don't exist
 if "file_path" not in st.session_state:
     st.session_state.file_path = None
@@ -113,6 +122,13 @@ def send_email(to_email, subject, body, attachment_path=None):
         st.error(f"Failed to send email: {str(e)}")
         return False
 
+# Helper function to keep an uploaded report in the attachment store under its own name
+def store_upload(uploaded_file, report_type):
+    """Path of an uploaded file in the attachment store (written only if its contents are new)."""
+    path = attachment_store.put(uploaded_file.getvalue(), uploaded_file.name, report_type=report_type,
+                                source={"upload": uploaded_file.name})
+    return str(path)
+
 # Helper function to generate sales excel for download/attachment
 def generate_sales_excel_download(df, filename="Rosatis_Sales_Report.xlsx"):
     output = BytesIO()
@@ -128,25 +144,24 @@ def generate_sales_excel_download(df, filename="Rosatis_Sales_Report.xlsx"):
         f.write(output.read())
     return str(file_path)
 
-def generate_ai_analysis(df):
-    """Generate AI-powered financial analysis using Google's Gemini."""
-    try:
-        # Prepare key metrics for analysis
-        metrics = {
-            'total_sales': df['Total Sales'].sum(),
-            'avg_daily_sales': df['Total Sales'].mean(),
-            'total_labor_cost': df['Labor Cost'].sum() if 'Labor Cost' in df.columns else 0,
-            'avg_labor_percent': df['Labor %'].mean() if 'Labor %' in df.columns else 0,
-            'total_voids': df['Voids Amount'].sum() if 'Voids Amount' in df.columns else 0,
-            'avg_delivery_charge': df['Delivery Charges'].mean() if 'Delivery Charges' in df.columns else 0,
-            'best_day': df.loc[df['Total Sales'].idxmax()]['Date'].strftime('%B %d, %Y') if not df.empty else 'N/A',
-            'worst_day': df.loc[df['Total Sales'].idxmin()]['Date'].strftime('%B %d, %Y') if not df.empty else 'N/A',
-            'best_sales': df['Total Sales'].max() if not df.empty else 0,
-            'worst_sales': df['Total Sales'].min() if not df.empty else 0
-        }
-
-        # Create prompt for Gemini
-        prompt = f"""As a financial analyst for a pizza restaurant, analyze the following metrics and provide detailed insights and recommendations:
+def sales_analysis_prompt(df):
+    """Gemini prompt for the financial analysis of a processed sales frame."""
+    # Prepare key metrics for analysis
+    metrics = {
+        'total_sales': df['Total Sales'].sum(),
+        'avg_daily_sales': df['Total Sales'].mean(),
+        'total_labor_cost': df['Labor Cost'].sum() if 'Labor Cost' in df.columns else 0,
+        'avg_labor_percent': df['Labor %'].mean() if 'Labor %' in df.columns else 0,
+        'total_voids': df['Voids Amount'].sum() if 'Voids Amount' in df.columns else 0,
+        'avg_delivery_charge': df['Delivery Charges'].mean() if 'Delivery Charges' in df.columns else 0,
+        'best_day': df.loc[df['Total Sales'].idxmax()]['Date'].strftime('%B %d, %Y') if not df.empty else 'N/A',
+        'worst_day': df.loc[df['Total Sales'].idxmin()]['Date'].strftime('%B %d, %Y') if not df.empty else 'N/A',
+        'best_sales': df['Total Sales'].max() if not df.empty else 0,
+        'worst_sales': df['Total Sales'].min() if not df.empty else 0
+    }
+
+    # Create prompt for Gemini
+    return f"""As a financial analyst for a pizza restaurant, analyze the following metrics and provide detailed insights and recommendations:
 
 Total Sales: ${metrics['total_sales']:,.2f}
 Average Daily Sales: ${metrics['avg_daily_sales']:,.2f}
@@ -165,18 +180,57 @@ Please provide:
 
 Format the response in a professional, easy-to-read manner suitable for a business report."""
 
-        # Call Gemini API with the new model name
-        model = genai.GenerativeModel('gemini-1.5-pro-latest')
-        response = model.generate_content(prompt)
-        return response.text
+def generate_ai_analysis(df):
+    """Generate AI-powered financial analysis using Google's Gemini."""
+    try:
+        # Call Gemini API (answers for identical prompts come from the AI cache)
+        return generate_text(sales_analysis_prompt(df))
 
     except Exception as e:
         st.error(f"Failed to generate AI analysis: {e}")
         return "AI analysis could not be generated at this time."
 
+def ai_section(title=None):
+    """Placeholder for an AI section, shown as 'generating' until fill_ai_sections renders into it."""
+    if title:
+        st.subheader(title)
+    placeholder = st.empty()
+    placeholder.info("⏳ Generating AI analysis...")
+    return placeholder
+
+def fill_ai_sections(sections):
+    """
+    Generates every AI section concurrently. sections maps a name to (prompt, placeholder, render).
+    Answers stream into their placeholders as plain Markdown; render(text) then redraws the finished section.
+    Answers are kept per session by prompt, so reruns redraw them without calling Gemini or the AI cache.
+    """
+    answers = st.session_state.setdefault("ai_answers", {})
+
+    def on_chunk(name, text):
+        sections[name][1].markdown(text + " ▌")
+
+    def on_done(name, text, error):
+        prompt, placeholder, render = sections[name]
+        with placeholder.container():
+            if error is not None:
+                st.error(f"Failed to generate AI analysis: {error}")
+            else:
+                answers[prompt_key(prompt)] = text
+                render(text)
+
+    jobs = {}
+    for name, (prompt, _, _) in sections.items():
+        if prompt_key(prompt) in answers:
+            on_done(name, answers[prompt_key(prompt)], None)
+        else:
+            jobs[name] = prompt
+    generate_many(jobs, on_done, on_chunk)
+
 # Sidebar for navigation
 st.sidebar.title("Navigation")
-page = st.sidebar.radio("Go to", ["Payroll Processor", "Sales Dashboard", "Financial Summary Email", "Schedule Maker", "AI Bartender", "Menu Analysis", "Action Plan & Marketing Strategy", "Accounting Assistant"])
+page = st.sidebar.radio("Go to", ["Payroll Processor", "Payroll History", "Sales Dashboard", "Sales History", "Financial Summary Email", "Schedule Maker", "AI Bartender", "Menu Analysis", "Action Plan & Marketing Strategy", "Accounting Assistant"])
+ai_stats = ai_cache_stats()
+st.sidebar.caption(f"AI cache: {ai_stats['hits']} hits, {ai_stats['misses']} misses, {ai_stats['entries']} saved answers")
 
 
 if page == "Payroll Processor":
@@ -200,12 +254,16 @@ if page == "Payroll Processor":
     email_file_button = st.button("📬 Pull Latest from Email")
     process_button = st.button("⚙️ Process Payroll Report")
     send_button = st.button("✉️ Email Report to Accountant")
+    batch_button = st.button("🗂️ Process All Payroll Files (uploads, downloads, data/inbox)")
 
     if uploaded_file:
-        with open(os.path.join("temp_uploaded_file.xlsx"), "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        st.session_state.file_path = "temp_uploaded_file.xlsx"
+        st.session_state.file_path = store_upload(uploaded_file, "payroll")
         st.success("File uploaded successfully!")
+    elif not st.session_state.file_path:
+        # Newest emailed payroll, already downloaded and processed by the inbox poller
+        st.session_state.file_path = stored_latest_report("payroll")
+        if st.session_state.file_path:
+            st.caption(f"Latest payroll from email: {os.path.basename(st.session_state.file_path)}")
 
     if email_file_button:
         file_path = download_latest_attachment()
@@ -223,10 +281,73 @@ if page == "Payroll Processor":
             st.dataframe(final_df)
             with open(output_path, "rb") as f:
                 st.download_button("⬇️ Download Final Report", f, file_name="Final_Payroll_Report.xlsx")
+            st.session_state.payroll_model = build_payroll_model(st.session_state.file_path)
 
         except Exception as e:
             st.error(f"❌ Failed to process: {e}")
 
+    # Rate/hours corrections: only the edited employee's rows and report cells are recomputed
+    payroll_model = st.session_state.get("payroll_model")
+    if payroll_model is not None and not payroll_model.df.empty:
+        with st.expander("✏️ Correct a Rate or Hours"):
+            employee_labels = {f"{row.Name} (ID {row.ID})": row.ID for row in payroll_model.df[["ID", "Name"]].itertuples()}
+            selected_employee = st.selectbox("Employee", list(employee_labels), key="correction_employee")
+            emp_id = employee_labels[selected_employee]
+            current_row = payroll_model.df.iloc[payroll_model.positions(emp_id)[0]]
+            col_rate, col_hours = st.columns(2)
+            new_rate = col_rate.number_input("Rate", value=float(current_row["Rate"]), step=0.25, key=f"correction_rate_{emp_id}")
+            new_hours = col_hours.number_input("Hours", value=float(current_row["Hours"]), step=0.25, key=f"correction_hours_{emp_id}")
+
+            fixed = payroll_model.fixed_by_override(emp_id)
+            if fixed:
+                st.caption(f"{' and '.join(sorted(fixed)).capitalize()} of this employee come from the payroll override table.")
+
+            if st.button("💾 Apply Correction"):
+                changed_cells = []
+                try:
+                    if new_rate != current_row["Rate"]:
+                        changed_cells += payroll_model.set_rate(emp_id, new_rate)
+                    if new_hours != current_row["Hours"]:
+                        changed_cells += payroll_model.set_hours(emp_id, new_hours)
+                except ValueError as e:
+                    st.error(f"❌ {e}")
+                if changed_cells:
+                    output_path = save_payroll_corrections(payroll_model, st.session_state.file_path)
+                    st.success(f"✅ Updated {len(changed_cells)} cells for {selected_employee}.")
+
+            st.dataframe(payroll_model.df)
+            col_total_hours, col_total_base, col_total_pay = st.columns(3)
+            col_total_hours.metric("Total Hours", f"{payroll_model.totals['Hours']:,.2f}")
+            col_total_base.metric("Total Base Pay", f"${payroll_model.totals['Base Pay']:,.2f}")
+            col_total_pay.metric("Total Pay", f"${payroll_model.totals['Total Pay']:,.2f}")
+            if os.path.exists("Final_Payroll_Report.xlsx"):
+                with open("Final_Payroll_Report.xlsx", "rb") as f:
+                    st.download_button("⬇️ Download Corrected Report", f, file_name="Final_Payroll_Report.xlsx", key="download_corrected_report")
+
+    if batch_button:
+        with st.spinner("Processing every payroll file..."):
+            try:
+                batch = run_batch()
+                if batch["periods"]:
+                    st.success(f"✅ Processed {len(batch['periods'])} pay periods into {REPORTS_DIR}")
+                    st.dataframe(pd.DataFrame([{
+                        "Period": f"{r['start']:%m/%d/%Y} - {r['end']:%m/%d/%Y}" if r["start"] else os.path.basename(r["path"]),
+                        "Employees": len(r["df"]),
+                        "Total Pay": round(r["df"]["Total Pay"].sum(), 2),
+                        "Report": r["report_path"],
+                    } for r in batch["periods"]]))
+                    for ytd_path in batch["ytd_reports"]:
+                        with open(ytd_path, "rb") as f:
+                            st.download_button(f"⬇️ Download {os.path.basename(ytd_path)}", f, file_name=os.path.basename(ytd_path))
+                else:
+                    st.warning("No payroll files found to process.")
+                if batch["skipped"]:
+                    with st.expander(f"Skipped {len(batch['skipped'])} files"):
+                        for skipped_path, reason in batch["skipped"]:
+                            st.write(f"{skipped_path}: {reason}")
+            except Exception as e:
+                st.error(f"❌ Failed to process payroll files: {e}")
+
     if send_button and st.session_state.get("file_path") and "Final_Payroll_Report.xlsx" in os.listdir("."):
         if not accountant_email_input:
             st.error("❌ Please enter the accountant's email address.")
@@ -238,6 +359,42 @@ if page == "Payroll Processor":
             except Exception as e:
                 st.error(f"❌ Failed to send email: {e}")
 
+elif page == "Payroll History":
+    st.title("🗓️ Payroll History")
+
+    periods_df = payroll_history.periods()
+    if periods_df.empty:
+        st.info("No pay periods recorded yet. Process a payroll report (or run the batch) to start the history.")
+    else:
+        st.subheader("Pay Periods")
+        st.dataframe(periods_df, use_container_width=True)
+
+        # Per-employee view across periods
+        st.subheader("👤 Employee History")
+        employees_df = payroll_history.employees()
+        employee_labels = {f"{row.Name} (ID {row.ID})": row.ID for row in employees_df.itertuples()}
+        selected_employee = st.selectbox("Employee", list(employee_labels))
+        last_n = st.slider("Last N periods", min_value=1, max_value=len(periods_df), value=min(6, len(periods_df))) if len(periods_df) > 1 else 1
+        history_df = payroll_history.employee_history(emp_id=employee_labels[selected_employee], last_n=last_n)
+        st.dataframe(history_df, use_container_width=True)
+
+        if not history_df.empty:
+            fig_history = go.Figure()
+            fig_history.add_trace(go.Bar(x=history_df["Period End"], y=history_df["Hours"], name="Hours", yaxis="y2", opacity=0.5))
+            fig_history.add_trace(go.Scatter(x=history_df["Period End"], y=history_df["Total Pay"], mode='lines+markers', name='Total Pay'))
+            fig_history.update_layout(height=400, xaxis_title="Period End", yaxis_title="Total Pay ($)",
+                                      yaxis2=dict(title="Hours", overlaying="y", side="right"),
+                                      legend=dict(font_size=14))
+            st.plotly_chart(fig_history, use_container_width=True)
+
+        # Year-to-date totals per employee
+        st.subheader("📅 Year-to-Date Totals")
+        years = sorted({int(end[:4]) for end in periods_df["Period End"]}, reverse=True)
+        selected_year = st.selectbox("Year", years)
+        ytd_df = payroll_history.ytd_totals(selected_year)
+        st.dataframe(ytd_df, use_container_width=True)
+        st.download_button("⬇️ Download YTD Totals (CSV)", ytd_df.to_csv(index=False), file_name=f"Payroll_YTD_{selected_year}.csv", mime="text/csv")
+
 elif page == "Sales Dashboard":
     st.title("📊 Rosati's Executive Sales Dashboard")
 
@@ -248,163 +405,79 @@ elif page == "Sales Dashboard":
     last_received = None
 
     if uploaded_file_sales:
-        # For uploaded file, we need to save it to a temporary path to use with pd.ExcelFile
-        temp_upload_path = Path("downloads") / "temp_sales_upload.xlsx"
-        temp_upload_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(temp_upload_path, "wb") as f:
-            f.write(uploaded_file_sales.getbuffer())
-        xlsx_path = str(temp_upload_path)
+        # The sales parser reads from a path, so the upload goes into the attachment store
+        xlsx_path = store_upload(uploaded_file_sales, "sales")
         last_received = "Manual upload"
     elif use_gmail:
         sales_info = download_latest_sales_report()
         if sales_info:
             xlsx_path = sales_info # Assuming download_latest_sales_report returns path directly now
             last_received = os.path.basename(sales_info) + " from email"
+            st.session_state.sales_xlsx_path = xlsx_path
         else:
             st.warning("No sales report found in Gmail.")
+    elif st.session_state.get("sales_xlsx_path"):
+        # Keep showing the last imported report when a control triggers a rerun
+        xlsx_path = st.session_state.sales_xlsx_path
+    else:
+        # Newest emailed report, already downloaded and parsed by the inbox poller
+        xlsx_path = stored_latest_report("sales")
+        if xlsx_path:
+            last_received = os.path.basename(xlsx_path) + " from email"
 
     if xlsx_path:
         try:
-            # Dynamic header detection
-            xlsx = pd.ExcelFile(xlsx_path, engine="openpyxl")
-            sheet_name = xlsx.sheet_names[0]
-            auto_header_row = None
-            for i in range(5, 15): # Search for header between row 6 and 16 (0-indexed)
-                try:
-                    row_data = xlsx.parse(sheet_name, header=i, nrows=1)
-                    if "Date" in row_data.columns:
-                        auto_header_row = i
-                        break
-                except Exception as e:
-                    continue
-
-            if auto_header_row is None:
-                st.error("Could not detect header row containing 'Date' column. Please check the Excel file.")
+            # Parsed and derived once per workbook content; reruns reuse the memoized model
+            try:
+                sales_model = load_sales_report(xlsx_path)
+            except ValueError as e:
+                st.error(str(e))
                 st.stop()
-
-            df = xlsx.parse(sheet_name, header=auto_header_row, engine="openpyxl")
-            df.columns = [str(col).replace("\n", " ").strip() for col in df.columns] # Clean column names
-
-            # Using a dictionary for mapping to handle potential variations and ensure consistency
-            column_mapping = {
-                'Total Sales': 'Total Sales',
-                'Total\nSales': 'Total Sales',
-                'Del Chg': 'Delivery Charges',
-                'Labor': 'Labor Hours', # Renamed 'Labor' to 'Labor Hours'
-                'Unnamed: 30': 'Labor Cost', # Explicitly map 'Unnamed: 30' to 'Labor Cost'
-                'Unnamed: 31': 'Labor %',    # Explicitly map 'Unnamed: 31' to 'Labor %'
-                'Cash & Carry': 'Cash & Carry',
-                'Pickup': 'Pickup',
-                'Delivery': 'Delivery',
-                'Liable Taxes': 'Taxable Sales',
-                'Non Liable Taxes': 'Non-Taxable Sales',
-                'Voids': 'Voids Amount',
-                'Chk\nCnt': 'Transaction Count',
-                'Check Cnt': 'Transaction Count'
-            }
-            df.rename(columns=column_mapping, inplace=True) # Apply renaming here
-            
-            # --- NEW: Extract Total Labor Cost and Labor % from the 'Total' row before filtering ---
-            total_labor_cost_summary = 0.0
-            avg_labor_percent_summary = 0.0
-            
-            # More robustly filter for the actual 'Total' row
-            # Look for 'Date' column exactly being 'Total' and ensure Labor Cost is not NaN
-            total_row_candidates = df[df["Date"].astype(str).str.strip() == "Total"].copy()
-
-            # Convert 'Labor Cost' and 'Labor %' columns in total_row_candidates to numeric
-            if 'Labor Cost' in total_row_candidates.columns:
-                total_row_candidates['Labor Cost'] = pd.to_numeric(total_row_candidates['Labor Cost'], errors='coerce').fillna(0.0)
-            if 'Labor %' in total_row_candidates.columns:
-                total_row_candidates['Labor %'] = pd.to_numeric(total_row_candidates['Labor %'], errors='coerce').fillna(0.0)
-            
-            if not total_row_candidates.empty:
-                # Get the last row in case there are multiple 'Total' entries (e.g., subtotals)
-                actual_total_row = total_row_candidates.tail(1)
-
-                if 'Labor Cost' in actual_total_row.columns:
-                    total_labor_cost_summary = actual_total_row['Labor Cost'].iloc[0] # Now directly numeric
-                if 'Labor %' in actual_total_row.columns:
-                    avg_labor_percent_summary = actual_total_row['Labor %'].iloc[0] # Now directly numeric
-            # --- END NEW EXTRACTION ---
-
-            df = df.dropna(how="all").copy()
-
-            # Filter out rows that contain 'Total' in the 'Date' column (summary rows) for daily calculations
-            if 'Date' in df.columns:
-                df = df[~df["Date"].astype(str).str.contains("Total", case=False, na=False)]
-                df["Date"] = pd.to_datetime(df["Date"], errors='coerce')
-                df = df[df["Date"].notna()].sort_values("Date")
-
-            # Convert numeric columns to numeric, coercing errors
-            # This list now correctly refers to the mapped columns after renaming
-            numeric_cols = ['Total Sales', 'Labor Cost', 'Labor %', 'Cash & Carry', 'Pickup', 'Delivery', 
-                            'Delivery Charges', 'Taxable Sales', 'Non-Taxable Sales', 'Voids Amount', 'Transaction Count'] 
-            for col in numeric_cols:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-
-            # Calculate additional metrics (for daily data only)
-            df['7d MA'] = df["Total Sales"].rolling(window=7, min_periods=1).mean()
-            df['Day'] = df['Date'].dt.day_name()
-            df['Month'] = df['Date'].dt.month_name()
-
-            # Calculate Daily Labor Percentage (for daily data only) - RE-ADDED and ensured uses proper columns
-            df['Labor %'] = df.apply(lambda row: (row['Labor Cost'] / row['Total Sales'] * 100) if row['Total Sales'] > 0 else 0, axis=1)
+            df = sales_model["df"]
 
             # Ensure the processed DataFrame is stored in session state for other pages
             st.session_state.processed_sales_df = df
             st.session_state.sales_file_name = os.path.basename(xlsx_path) # Store the filename
 
+            # Append the report's days to the multi-period sales history (once per workbook)
+            sales_source = uploaded_file_sales.name if uploaded_file_sales else os.path.basename(xlsx_path)
+            if record_sales_history(sales_model, source=sales_source):
+                st.caption(f"Added {sales_source} to the sales history.")
+
+            # KPI tiles and charts read the precomputed metrics cube
+            cube = sales_model["cube"]
+            kpis = cube["kpis"]
+            daily = cube["daily"]
+
             # KPI Cards
             st.subheader("Key Performance Indicators")
             col1, col2, col3 = st.columns(3)
-            total_sales = df['Total Sales'].sum() # This will be sum of daily sales after filtering
-            avg_daily_sales = df['Total Sales'].mean()
-            
-            # Use extracted summary values for KPI display
-            col1.metric("Total Sales", f"${total_sales:,.2f}") # Aligned to 2 decimal places
-            col2.metric("Avg Daily Sales", f"${avg_daily_sales:,.2f}") # Aligned to 2 decimal places
-            col3.metric("Total Labor Cost", f"${total_labor_cost_summary:,.2f}") # Aligned to 2 decimal places
-            
-            col4, col5, col6 = st.columns(3)
-            col4.metric("Avg Labor %", f"{avg_labor_percent_summary:,.2f}%") 
-            # total_voids_amount and avg_delivery_charge can be calculated from the filtered daily data
-            total_voids_amount = df['Voids Amount'].sum() if 'Voids Amount' in df.columns else 0
-            avg_delivery_charge = df['Delivery Charges'].mean() if 'Delivery Charges' in df.columns else 0
+            col1.metric("Total Sales", f"${kpis['total_sales']:,.2f}") # Aligned to 2 decimal places
+            col2.metric("Avg Daily Sales", f"${kpis['avg_daily_sales']:,.2f}") # Aligned to 2 decimal places
+            col3.metric("Total Labor Cost", f"${kpis['total_labor_cost']:,.2f}") # Aligned to 2 decimal places
 
-            col5.metric("Total Voids Impact", f"${total_voids_amount:,.2f}") # Aligned to 2 decimal places
-            col6.metric("Avg Delivery Charge", f" ${avg_delivery_charge:,.2f}") # Aligned to 2 decimal places
+            col4, col5, col6 = st.columns(3)
+            col4.metric("Avg Labor %", f"{kpis['avg_labor_percent']:,.2f}%")
+            col5.metric("Total Voids Impact", f"${kpis['total_voids']:,.2f}") # Aligned to 2 decimal places
+            col6.metric("Avg Delivery Charge", f" ${kpis['avg_delivery_charge']:,.2f}") # Aligned to 2 decimal places
 
             # Best and Worst Sales Day
-            if not df.empty and 'Total Sales' in df.columns:
-                daily_summary_df = df.groupby("Date")["Total Sales"].sum().reset_index()
-                if not daily_summary_df.empty:
-                    best_day = daily_summary_df.loc[daily_summary_df["Total Sales"].idxmax()]
-                    worst_day = daily_summary_df.loc[daily_summary_df["Total Sales"].idxmin()]
-                    st.subheader("🏆 Daily Sales Performance Summary")
-                    st.markdown(f"## **Best Sales Day:** {best_day['Date'].strftime('%B %d, %Y')} with ${best_day['Total Sales']:,.2f}") # Increased to H2
-                    st.markdown(f"## **Worst Sales Day:** {worst_day['Date'].strftime('%B %d, %Y')} with ${worst_day['Total Sales']:,.2f}") # Increased to H2
-                else:
-                    st.info("Not enough data to determine best/worst sales day.")
+            if kpis["best_day"] is not None:
+                st.subheader("🏆 Daily Sales Performance Summary")
+                st.markdown(f"## **Best Sales Day:** {kpis['best_day'].strftime('%B %d, %Y')} with ${kpis['best_sales']:,.2f}") # Increased to H2
+                st.markdown(f"## **Worst Sales Day:** {kpis['worst_day'].strftime('%B %d, %Y')} with ${kpis['worst_sales']:,.2f}") # Increased to H2
+            else:
+                st.info("Not enough data to determine best/worst sales day.")
 
 
             # Daily Sales & 7-Day Trend
             st.subheader("📈 Daily Sales & 7-Day Trend")
-            fig_daily_sales = go.Figure()
-            fig_daily_sales.add_trace(go.Scatter(x=df["Date"], y=df["Total Sales"], mode='lines+markers', name='Daily Sales'))
-            fig_daily_sales.add_trace(go.Scatter(x=df["Date"], y=df["7d MA"], mode='lines', name='7-Day Avg', line=dict(dash='dash')))
-            fig_daily_sales.update_layout(margin=dict(l=20, r=20, t=30, b=20), height=400, 
-                                          xaxis=dict(title_font_size=16, tickfont_size=14),
-                                          yaxis=dict(title_font_size=16, tickfont_size=14),
-                                          legend=dict(font_size=14),
-                                          xaxis_title="Date", yaxis_title="Total Sales ($")
-            st.plotly_chart(fig_daily_sales, use_container_width=True)
+            # Long series are downsampled and drawn with WebGL; the figure is reused while the data is unchanged
+            st.plotly_chart(daily_sales_figure(daily), use_container_width=True)
 
             # Sales by Day of Week
             st.subheader("📊 Sales by Day of Week")
-            weekday_sales = df.groupby("Day")["Total Sales"].mean().reindex(
-                ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"])
+            weekday_sales = cube["weekday"]["Total Sales"]
             fig_weekday_sales = go.Figure([go.Bar(x=weekday_sales.index, y=weekday_sales.values, 
                                                  text=[f"${v:,.0f}" for v in weekday_sales.values], textposition='outside', textfont_size=20)]) # Increased text font size
             fig_weekday_sales.update_layout(height=350, yaxis_title="Average Sales ($",
@@ -412,46 +485,43 @@ elif page == "Sales Dashboard":
                                             yaxis=dict(title_font_size=16, tickfont_size=14))
             st.plotly_chart(fig_weekday_sales, use_container_width=True)
 
+            # Weekly and Monthly Totals
+            st.subheader("🗓️ Weekly & Monthly Totals")
+            period_view = st.radio("Group by", ["Week", "Month"], horizontal=True, key="sales_period_view")
+            period_totals = cube["week"] if period_view == "Week" else cube["month"]
+            fig_period = go.Figure()
+            fig_period.add_trace(go.Bar(x=period_totals.index, y=period_totals["Total Sales"], name='Total Sales'))
+            fig_period.add_trace(go.Scatter(x=period_totals.index, y=period_totals["Labor %"], mode='lines+markers', name='Labor %', yaxis="y2"))
+            fig_period.update_layout(height=400, xaxis_title=f"{period_view} Starting", yaxis_title="Sales ($)",
+                                     yaxis2=dict(title="Labor %", overlaying="y", side="right"),
+                                     legend=dict(font_size=14))
+            st.plotly_chart(fig_period, use_container_width=True)
+
             # Order Type Breakdown (Stacked Bar Chart)
-            order_type_cols = ['Cash & Carry', 'Pickup', 'Delivery', 'Table'] # Added 'Table'
-            # Filter for only columns that actually exist in the DataFrame
-            existing_order_type_cols = [col for col in order_type_cols if col in df.columns]
+            existing_order_type_cols = cube["order_types"]
             if existing_order_type_cols:
-                st.subheader("📈 Order Type Breakdown (Daily)")
-                fig_order_type = go.Figure()
-                
-                # Define consistent colors for order types
-                order_type_colors = {
-                    'Table': '#1f77b4', # Blue
-                    'Pickup': '#ff7f0e', # Orange
-                    'Cash & Carry': '#2ca02c', # Green
-                    'Delivery': '#d62728' # Red
-                }
-
-                for col in existing_order_type_cols:
-                    fig_order_type.add_trace(go.Bar(x=df["Date"], y=df[col], name=col, marker_color=order_type_colors.get(col, '#cccccc')))
-                fig_order_type.update_layout(barmode='stack', height=400, 
-                                             xaxis_title="Date", yaxis_title="Sales ($",
-                                             xaxis=dict(title_font_size=16, tickfont_size=14),
-                                             yaxis=dict(title_font_size=16, tickfont_size=14),
-                                             legend=dict(font_size=14))
+                # Bucketed by week once there are too many days for one bar each
+                fig_order_type, order_type_bucket = order_type_figure(cube)
+                st.subheader(f"📈 Order Type Breakdown ({order_type_bucket})")
                 st.plotly_chart(fig_order_type, use_container_width=True)
             else:
                 st.info("No order type breakdown data available.")
 
-            # AI Analysis (if desired)
-            st.subheader("🧠 AI Financial Analysis")
+            # AI Analysis: the charts above are already on screen while it generates (repeat runs hit the AI cache)
             if 'processed_sales_df' in st.session_state:
-                # Generate AI analysis using the processed sales data
-                analysis_text = generate_ai_analysis(st.session_state.processed_sales_df)
-                st.markdown(analysis_text)
-                st.download_button(
-                    label="Download AI Analysis",
-                    data=analysis_text,
-                    file_name="AI_Financial_Analysis.txt",
-                    mime="text/plain"
-                )
+                def render_sales_analysis(analysis_text):
+                    st.markdown(analysis_text)
+                    st.download_button(
+                        label="Download AI Analysis",
+                        data=analysis_text,
+                        file_name="AI_Financial_Analysis.txt",
+                        mime="text/plain"
+                    )
+
+                fill_ai_sections({"sales": (sales_analysis_prompt(st.session_state.processed_sales_df),
+                                            ai_section("🧠 AI Financial Analysis"), render_sales_analysis)})
             else:
+                st.subheader("🧠 AI Financial Analysis")
                 st.info("Upload a sales report to generate AI analysis.")
 
         except Exception as e:
@@ -459,6 +529,71 @@ elif page == "Sales Dashboard":
     else:
         st.info("Please upload a sales report or import one from Gmail.")
 
+elif page == "Sales History":
+    st.title("📚 Sales History")
+
+    first_day, last_day = sales_history.date_range()
+    if first_day is None:
+        st.info("No sales recorded yet. Load a sales report on the Sales Dashboard to start the history.")
+    else:
+        st.caption(f"Daily sales stored from {first_day:%B %d, %Y} to {last_day:%B %d, %Y}")
+
+        # Any stored date range, compared with the same dates a year earlier or the period just before
+        default_start = max(first_day, last_day.replace(day=1))
+        col1, col2 = st.columns(2)
+        selected_range = col1.date_input("Date range", value=(default_start.date(), last_day.date()),
+                                         min_value=first_day.date(), max_value=last_day.date())
+        compare_with = col2.radio("Compare with", ["Same period last year", "Previous period", "Nothing"], horizontal=True)
+
+        if len(selected_range) == 2:
+            range_start, range_end = pd.Timestamp(selected_range[0]), pd.Timestamp(selected_range[1])
+            if compare_with == "Same period last year":
+                offset = pd.DateOffset(years=1)
+            else:
+                offset = pd.Timedelta(days=(range_end - range_start).days + 1)
+            current = history_cube(range_start, range_end)
+            previous = history_cube(range_start - offset, range_end - offset) if compare_with != "Nothing" else None
+            has_previous = previous is not None and not previous["daily"].empty
+
+            def delta(key):
+                return f"{current['kpis'][key] - previous['kpis'][key]:+,.2f}" if has_previous else None
+
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Total Sales", f"${current['kpis']['total_sales']:,.2f}", delta("total_sales"))
+            col2.metric("Avg Daily Sales", f"${current['kpis']['avg_daily_sales']:,.2f}", delta("avg_daily_sales"))
+            col3.metric("Total Labor Cost", f"${current['kpis']['total_labor_cost']:,.2f}", delta("total_labor_cost"), delta_color="inverse")
+            col4.metric("Labor %", f"{current['kpis']['avg_labor_percent']:,.2f}%", delta("avg_labor_percent"), delta_color="inverse")
+            if compare_with != "Nothing" and not has_previous:
+                st.caption("No stored sales for the comparison period.")
+
+            # Daily sales of both periods on the selected period's dates
+            fig_history = go.Figure()
+            fig_history.add_trace(line_trace(current["daily"].index, current["daily"]["Total Sales"], f"{range_start:%b %d, %Y} - {range_end:%b %d, %Y}"))
+            if has_previous:
+                fig_history.add_trace(line_trace(previous["daily"].index + offset, previous["daily"]["Total Sales"], compare_with, mode='lines', line=dict(dash='dash')))
+            fig_history.update_layout(height=400, xaxis_title="Date", yaxis_title="Sales ($)", legend=dict(font_size=14))
+            st.plotly_chart(fig_history, use_container_width=True)
+
+            st.subheader("📆 Monthly Totals")
+            st.dataframe(current["month"], use_container_width=True)
+
+        # Days far off their weekday baseline, from the incrementally updated monitor
+        st.subheader("🚨 Unusual Days")
+        monitor = refresh_sales_monitor()
+        anomalies_df = monitor.anomalies_frame()
+        if anomalies_df.empty:
+            st.info("No unusual days: sales and Labor % are within the normal range for their weekday.")
+        else:
+            st.caption(f"Days whose sales or Labor % is at least {monitor.settings['z_threshold']} standard deviations "
+                       f"from the last {monitor.settings['baseline_weeks']} same weekdays ({len(anomalies_df)} of {monitor.days} days).")
+            st.dataframe(anomalies_df.style.format({"Total Sales": "${:,.2f}", "Weekday Avg Sales": "${:,.2f}",
+                                                    "Labor %": "{:.1f}%", "Weekday Avg Labor %": "{:.1f}%",
+                                                    "Sales z": "{:+.1f}", "Labor % z": "{:+.1f}"}),
+                         use_container_width=True)
+
+        with st.expander("Imported reports"):
+            st.dataframe(sales_history.reports(), use_container_width=True)
+
 elif page == "Financial Summary Email":
     st.title("📧 Send Financial Summary Email")
 
@@ -494,6 +629,12 @@ elif page == "Schedule Maker":
         st.session_state.schedule_df = pd.DataFrame()
     if "schedule_file_path" not in st.session_state:
         st.session_state.schedule_file_path = None
+    if st.session_state.schedule_file_path is None:
+        # Newest emailed schedule, already downloaded and read by the inbox poller
+        latest_schedule = stored_latest_report("schedule")
+        if latest_schedule:
+            st.session_state.schedule_file_path = latest_schedule
+            st.session_state.schedule_df = parse_employee_schedule(latest_schedule)
 
     col1, col2 = st.columns(2)
     with col1:
@@ -519,13 +660,10 @@ elif page == "Schedule Maker":
     with col2:
         uploaded_schedule_file = st.file_uploader("Upload Schedule Excel File", type=["xlsx"], key="schedule_uploader")
         if uploaded_schedule_file:
-            temp_upload_path = Path("downloads") / "uploaded_employee_schedule.xlsx"
-            temp_upload_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(temp_upload_path, "wb") as f:
-                f.write(uploaded_schedule_file.getbuffer())
-            df = parse_employee_schedule(str(temp_upload_path))
+            schedule_path = store_upload(uploaded_schedule_file, "schedule")
+            df = parse_employee_schedule(schedule_path)
             if not df.empty:
-                st.session_state.schedule_file_path = str(temp_upload_path)
+                st.session_state.schedule_file_path = schedule_path
                 st.session_state.schedule_df = df
                 st.success("Schedule uploaded and loaded successfully!")
                 if 'Date' in st.session_state.schedule_df.columns:
@@ -586,23 +724,25 @@ elif page == "Menu Analysis":
                     st.warning("No menu analysis report found in Gmail.")
 
     # Process the menu analysis file
-    menu_file_path = st.session_state.get('menu_file_path')
+    # Falls back to the newest emailed report, already downloaded and read by the inbox poller
+    menu_file_path = st.session_state.get('menu_file_path') or stored_latest_report("menu")
     if uploaded_menu_file:
-        temp_upload_path = Path("downloads") / "temp_menu_upload.xlsx"
-        temp_upload_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(temp_upload_path, "wb") as f:
-            f.write(uploaded_menu_file.getbuffer())
-        menu_file_path = str(temp_upload_path)
+        menu_file_path = store_upload(uploaded_menu_file, "menu")
         st.session_state.menu_file_path = menu_file_path
 
     if menu_file_path:
         try:
-            # Use the new parsing function
-            df = parse_menu_sales_report(menu_file_path)
+            # Use the new parsing function; its AI analysis is generated after the charts below are drawn
+            df = parse_menu_sales_report(menu_file_path, with_analysis=False)
             
             # Store processed menu DataFrame and filename in session state
             st.session_state.processed_menu_df = df
             st.session_state.menu_file_name = os.path.basename(menu_file_path)
+            menu_ai_sections = {}
+            date_range = extract_date_range(os.path.basename(menu_file_path))
+            if not df.empty and date_range[0] is not None:
+                menu_ai_sections["menu"] = (menu_analysis_prompt(df, calculate_metrics(df), date_range),
+                                            ai_section(), display_ai_analysis)
             
             if df.empty:
                 st.warning("Parsed menu data is empty. Please check the file content or format.")
@@ -673,6 +813,8 @@ elif page == "Menu Analysis":
                 with st.expander("View Raw Menu Data"):
                     st.dataframe(df)
 
+            fill_ai_sections(menu_ai_sections)
+
         except Exception as e:
             st.error(f"❌ An unexpected error occurred while processing the menu analysis file: {e}")
     else:
@@ -686,15 +828,13 @@ elif page == "AI Bartender":
 
     if st.button("Get Recipe"):
         if drink_name:
-            with st.spinner(f"Getting recipe for {drink_name}..."):
-                try:
-                    prompt = f"""You are an expert bartender. Provide a detailed, step-by-step recipe for making a {drink_name}. Include ingredients with exact measurements, instructions, and any garnish suggestions. Respond in a clear, concise, and friendly manner."""
-                    model = genai.GenerativeModel('gemini-1.5-pro-latest')
-                    response = model.generate_content(prompt)
-                    st.subheader(f"Recipe for {drink_name}:")
-                    st.write(response.text)
-                except Exception as e:
-                    st.error(f"Failed to fetch recipe: {e}")
+            try:
+                prompt = f"""You are an expert bartender. Provide a detailed, step-by-step recipe for making a {drink_name}. Include ingredients with exact measurements, instructions, and any garnish suggestions. Respond in a clear, concise, and friendly manner."""
+                st.subheader(f"Recipe for {drink_name}:")
+                # The recipe is shown as it is generated
+                st.write_stream(stream_text(prompt))
+            except Exception as e:
+                st.error(f"Failed to fetch recipe: {e}")
         else:
             st.warning("Please enter a drink name.")
 
@@ -717,23 +857,28 @@ elif page == "Action Plan & Marketing Strategy":
                               height=150)
         if st.button("Generate Action Plan"):
             if prompt:
-                with st.spinner("Generating action plan..."):
-                    # Combine relevant data for Gemini
-                    combined_data = f"Sales Data (first 10 rows):\n{sales_df.head(10).to_string()}\n\nMenu Data (first 10 rows):\n{menu_df.head(10).to_string()}\n\nUser Request: {prompt}"
-                    
-                    try:
-                        model = genai.GenerativeModel('gemini-1.5-pro-latest')
-                        response = model.generate_content(combined_data)
-                        st.write("### Generated Action Plan")
-                        st.markdown(response.text)
-                        st.download_button(
-                            label="Download Action Plan",
-                            data=response.text,
-                            file_name="Action_Plan_Marketing_Strategy.txt",
-                            mime="text/plain"
-                        )
-                    except Exception as e:
-                        st.error(f"Failed to generate action plan: {e}")
+                # Combine relevant data for Gemini
+                combined_data = f"Sales Data (first 10 rows):\n{sales_df.head(10).to_string()}\n\nMenu Data (first 10 rows):\n{menu_df.head(10).to_string()}\n\nUser Request: {prompt}"
+
+                def render_action_plan(action_plan_text):
+                    st.markdown(action_plan_text)
+                    st.download_button(
+                        label="Download Action Plan",
+                        data=action_plan_text,
+                        file_name="Action_Plan_Marketing_Strategy.txt",
+                        mime="text/plain"
+                    )
+
+                # The action plan and the sales and menu analyses behind it are generated concurrently,
+                # each section filled in as soon as its answer arrives
+                sections = {"action_plan": (combined_data, ai_section("Generated Action Plan"), render_action_plan)}
+                if not sales_df.empty:
+                    sections["sales"] = (sales_analysis_prompt(sales_df), ai_section("🧠 AI Financial Analysis"), st.markdown)
+                menu_date_range = extract_date_range(st.session_state.get("menu_file_name", ""))
+                if not menu_df.empty and menu_date_range[0] is not None:
+                    sections["menu"] = (menu_analysis_prompt(menu_df, calculate_metrics(menu_df), menu_date_range),
+                                        ai_section(), display_ai_analysis)
+                fill_ai_sections(sections)
             else:
                 st.warning("Please enter a prompt for the action plan.")
     else:
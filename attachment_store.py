@@ -0,0 +1,169 @@
+# Content-addressed store for report files pulled from email or uploaded in the app
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+from contextlib import closing, contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from utils import file_sha256
+
+STORE_DIR = Path("downloads/store")
+MANIFEST_NAME = "manifest.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    digest TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    report_type TEXT,
+    period_start TEXT,
+    period_end TEXT,
+    stored_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sources (
+    id TEXT NOT NULL,          -- '' for sources that can't be looked up (e.g. uploads)
+    digest TEXT NOT NULL,
+    info TEXT NOT NULL,        -- the source dict as JSON
+    UNIQUE (id, digest, info)
+);
+CREATE INDEX IF NOT EXISTS idx_sources_id ON sources (id);
+"""
+
+_HEX_DIGEST = re.compile(r"[0-9a-f]{64}")
+_PERIOD = re.compile(r"(\d{8})_(\d{8})")
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    """Writes via a temp file in the same folder and os.replace, so readers never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+def file_period(filename: str) -> list:
+    """['YYYY-MM-DD', 'YYYY-MM-DD'] from a POS export name like ..._20250501_20250531.xlsx, or None."""
+    match = _PERIOD.search(filename)
+    if not match:
+        return None
+    return [f"{value[:4]}-{value[4:6]}-{value[6:]}" for value in match.groups()]
+
+
+def stored_hash(file_path) -> str:
+    """SHA-256 of a file inside the store, taken from its folder name (no read), or None for other files."""
+    path = Path(file_path)
+    if _HEX_DIGEST.fullmatch(path.parent.name) and path.parent.parent.resolve() == STORE_DIR.resolve():
+        return path.parent.name
+    return None
+
+
+def content_hash(file_path) -> str:
+    """SHA-256 of a file: read from the folder name for store files, otherwise hashed from its bytes."""
+    return stored_hash(file_path) or file_sha256(file_path)
+
+
+class AttachmentStore:
+    """
+    Report files kept once per content: `<root>/<sha256>/<original file name>`.
+
+    The original name is kept because periods are read from POS export names
+    (YYYYMMDD_YYYYMMDD). Storing bytes that are already present doesn't rewrite the file. The
+    manifest (SQLite, so the app and a separate poller process can write it at once) records
+    each hash's file, report type and period, and the sources it came from (mail message/part
+    or upload). Sources with an id let a known mail attachment be found without downloading it.
+    The folder and manifest are created on first use, not when the store is constructed.
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = Path(root)
+        self._ready = False
+
+    @contextmanager
+    def _connect(self):
+        """Connection that commits on success, rolls back on error and is always closed."""
+        if not self._ready:
+            self.root.mkdir(parents=True, exist_ok=True)
+            # Idempotent, so threads racing here on first use are harmless
+            with closing(sqlite3.connect(self.root / MANIFEST_NAME, timeout=30)) as conn:
+                conn.executescript(SCHEMA)
+            self._ready = True
+        conn = sqlite3.connect(self.root / MANIFEST_NAME, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def put(self, data: bytes, filename: str, report_type: str = None, source: dict = None) -> Path:
+        """Stores a file's bytes (if new) and records the source. Returns its path in the store."""
+        digest = hashlib.sha256(data).hexdigest()
+        relative = f"{digest}/{os.path.basename(filename) or 'attachment'}"
+        with self._connect() as conn:
+            row = conn.execute("SELECT path FROM files WHERE digest = ?", (digest,)).fetchone()
+            if row is not None and (self.root / row[0]).exists():
+                relative = row[0]
+            else:
+                # Same bytes under the same name, so concurrent writers of one file can't conflict
+                _atomic_write(self.root / relative, data)
+            period = file_period(filename) or [None, None]
+            # Every statement is idempotent: writers in other processes can't undo each other's entries
+            conn.execute("INSERT OR IGNORE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                         (digest, relative, os.path.basename(filename), len(data), report_type,
+                          period[0], period[1], datetime.now().isoformat(timespec="seconds")))
+            conn.execute("UPDATE files SET path = ? WHERE digest = ? AND path != ?", (relative, digest, relative))
+            if report_type:
+                conn.execute("UPDATE files SET report_type = ? WHERE digest = ? AND report_type IS NULL",
+                             (report_type, digest))
+            if source:
+                conn.execute("INSERT OR IGNORE INTO sources VALUES (?, ?, ?)",
+                             (source.get("id") or "", digest, json.dumps(source, sort_keys=True)))
+        return self.root / relative
+
+    def _existing(self, relative: str) -> Path:
+        path = self.root / relative
+        return path if path.exists() else None
+
+    def find_source(self, source_id: str) -> Path:
+        """Path of the file already stored from a source (e.g. a mail attachment part), or None."""
+        with self._connect() as conn:
+            row = conn.execute("""SELECT files.path FROM sources JOIN files USING (digest)
+                                  WHERE sources.id = ?""", (source_id,)).fetchone()
+        return self._existing(row[0]) if row else None
+
+    def entry(self, digest: str) -> dict:
+        """Manifest entry of a stored hash (with its sources and period), or None."""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM files WHERE digest = ?", (digest,)).fetchone()
+            if row is None:
+                return None
+            sources = [json.loads(info) for (info,) in
+                       conn.execute("SELECT info FROM sources WHERE digest = ?", (digest,))]
+        entry = dict(row)
+        start, end = entry.pop("period_start"), entry.pop("period_end")
+        entry["period"] = [start, end] if start else None
+        entry["sources"] = sources
+        return entry
+
+    def files(self, report_type: str = None) -> list:
+        """Stored file paths (optionally of one report type), most recently stored first."""
+        with self._connect() as conn:
+            rows = conn.execute("""SELECT path FROM files WHERE ? IS NULL OR report_type = ?
+                                   ORDER BY stored_at DESC, rowid DESC""", (report_type, report_type)).fetchall()
+        return [path for path in (self._existing(relative) for (relative,) in rows) if path]
+
+
+attachment_store = AttachmentStore()
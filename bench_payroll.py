@@ -0,0 +1,173 @@
+"""
+Benchmark for the payroll engine.
+
+Compares the columnar payroll_engine.compute_payroll against the original row-by-row
+loop from app_logic.process_payroll_excel on synthetic reports.
+
+    python bench_payroll.py                 # 10k and 100k employee-rows
+    python bench_payroll.py --rows 5000     # custom sizes
+    python bench_payroll.py --legacy-max 10000   # skip the slow loop above this size
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from payroll_engine import compute_payroll, normalize_names
+
+JOBS = ["Server", "Support", "FOH Lead", "Kitchen Staff", "Kitchen Manager", ""]
+
+
+def make_report(n_employees: int, seed: int = 0) -> pd.DataFrame:
+    """Builds a renamed raw payroll frame: one ID row plus one ID-less detail row per employee."""
+    rng = np.random.default_rng(seed)
+    ids = rng.integers(1, 200, n_employees)
+    base_pay = rng.uniform(0, 1500, n_employees).round(2)
+    cc_tips = rng.uniform(0, 1000, n_employees).round(2)
+    cash_tips = rng.uniform(0, 120, n_employees).round(2)
+    driver = np.where(rng.random(n_employees) < 0.05, 900.0, 0.0)
+    has_detail = rng.random(n_employees) < 0.9
+
+    main = pd.DataFrame({
+        "ID": ids.astype(float),
+        "Name": [f"Employee{i}, Test" for i in range(n_employees)],
+        "Job_Desc": np.nan,
+        "Rate": np.nan,
+        "Hours": np.nan,
+        "Base_Pay_Excel": base_pay,
+        "Driver_Reim": driver,
+        "CC_Tips_Raw": cc_tips,
+        "Cash_Tips_Raw": cash_tips,
+        "Total_Pay_Excel": base_pay + cc_tips + cash_tips,
+    })
+    detail = pd.DataFrame({
+        "ID": np.nan,
+        "Name": np.nan,
+        "Job_Desc": rng.choice(JOBS, n_employees),
+        "Rate": np.nan,
+        "Hours": np.nan,
+        "Base_Pay_Excel": np.nan,
+        "Driver_Reim": np.nan,
+        "CC_Tips_Raw": np.nan,
+        "Cash_Tips_Raw": np.nan,
+        "Total_Pay_Excel": np.nan,
+    })
+    main["_order"] = np.arange(n_employees) * 2
+    detail["_order"] = np.arange(n_employees) * 2 + 1
+    df = pd.concat([main, detail[has_detail]]).sort_values("_order")
+    return df.drop(columns="_order").reset_index(drop=True)
+
+
+def legacy_compute(df_raw: pd.DataFrame, rates: dict, excluded_names=()) -> pd.DataFrame:
+    """The original per-row loop, minus debug prints and rates.json writes, with the CC tips fix."""
+    rates = dict(rates)
+    processed_rows = []
+    i = 0
+    while i < len(df_raw):
+        current_row = df_raw.iloc[i]
+        id_raw = current_row.get("ID")
+        name_raw = current_row.get("Name")
+        if pd.isna(id_raw) or pd.isna(name_raw):
+            i += 1
+            continue
+        id_val = int(id_raw)
+        name = str(name_raw).strip()
+        normalized_name = ' '.join(name.lower().replace(',', '').split())
+        cc_tips = float(current_row.get("CC_Tips_Raw")) if pd.notna(current_row.get("CC_Tips_Raw")) else 0.0
+        cash_tips = float(current_row.get("Cash_Tips_Raw")) if pd.notna(current_row.get("Cash_Tips_Raw")) else 0.0
+        driver_reim = float(current_row.get("Driver_Reim")) if pd.notna(current_row.get("Driver_Reim")) else 0.0
+        base_pay_from_excel = float(current_row.get("Base_Pay_Excel")) if pd.notna(current_row.get("Base_Pay_Excel")) else 0.0
+        total_pay_from_excel = float(current_row.get("Total_Pay_Excel")) if pd.notna(current_row.get("Total_Pay_Excel")) else 0.0
+        job_desc = str(current_row.get("Job_Desc")).strip() if pd.notna(current_row.get("Job_Desc")) else ""
+        rate = rates.get(id_val, rates.get(normalized_name, 0.0))
+        hours = float(current_row.get("Hours")) if pd.notna(current_row.get("Hours")) else 0.0
+        if i + 1 < len(df_raw) and pd.isna(df_raw.iloc[i + 1].get("ID")):
+            next_row = df_raw.iloc[i + 1]
+            job_desc = str(next_row.get("Job_Desc")).strip() if pd.notna(next_row.get("Job_Desc")) else job_desc
+            if pd.notna(next_row.get("Rate")):
+                rate = float(next_row.get("Rate"))
+            hours = float(next_row.get("Hours")) if pd.notna(next_row.get("Hours")) else 0.0
+            driver_reim = float(next_row.get("Driver_Reim")) if pd.notna(next_row.get("Driver_Reim")) else driver_reim
+            cc_tips = float(next_row.get("CC_Tips_Raw")) if pd.notna(next_row.get("CC_Tips_Raw")) else cc_tips
+            i += 1
+        if rate == 0 and normalized_name not in excluded_names:
+            if "support" in job_desc.lower():
+                rate = 15.0
+                rates[normalized_name] = rate
+            elif "server" in job_desc.lower():
+                rate = 9.0
+                rates[normalized_name] = rate
+        if id_val == 123:
+            rate, hours = 10.40, 40.0
+            base_pay = hours * rate
+        elif id_val == 110:
+            rate, hours = 15.00, 68.0
+            base_pay = hours * rate
+        elif id_val == 4:
+            base_pay = 0.0
+        elif rate > 0 and hours > 0:
+            base_pay = hours * rate
+        elif base_pay_from_excel > 0:
+            base_pay = base_pay_from_excel
+        elif total_pay_from_excel > 0 and total_pay_from_excel >= cc_tips + cash_tips + driver_reim:
+            base_pay = total_pay_from_excel - cc_tips - cash_tips - driver_reim
+        else:
+            base_pay = 0.0
+        hours_calc = hours
+        if rate > 0 and normalized_name not in excluded_names:
+            hours_calc = base_pay / rate
+        other_tips = cc_tips + cash_tips
+        processed_rows.append({
+            "ID": id_val, "Name": name, "Job Description": job_desc, "Rate": rate,
+            "Hours": round(hours_calc, 2), "Base Pay": round(base_pay, 2),
+            "Driver Reim.": round(driver_reim, 2), "CC Tips": round(cc_tips, 2),
+            "Cash Tips": round(cash_tips, 2), "Other Tips": round(other_tips, 2),
+            "Total Pay": round(base_pay + other_tips, 2),
+        })
+        i += 1
+    return pd.DataFrame(processed_rows)
+
+
+def time_call(func, *args, repeat: int = 3) -> float:
+    """Best-of-N wall clock seconds for func(*args)."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000], help="employee-rows per report")
+    parser.add_argument("--legacy-max", type=int, default=100_000, help="largest size to run the legacy loop on")
+    args = parser.parse_args()
+
+    id_rates = {i: 9.0 + (i % 7) for i in range(1, 200, 3)}
+    name_rates = {"employee1 test": 12.0}
+    rates = {**id_rates, **name_rates}
+
+    print(f"{'rows':>8} {'engine s':>10} {'rows/s':>12} {'legacy s':>10} {'rows/s':>12} {'speedup':>8}")
+    for n in args.rows:
+        df_raw = make_report(n)
+        engine_s = time_call(compute_payroll, df_raw, id_rates, name_rates)
+        line = f"{n:>8} {engine_s:>10.4f} {n / engine_s:>12,.0f}"
+        if n <= args.legacy_max:
+            legacy_s = time_call(legacy_compute, df_raw, rates, repeat=1)
+            line += f" {legacy_s:>10.3f} {n / legacy_s:>12,.0f} {legacy_s / engine_s:>7.0f}x"
+
+            # Sanity check: both implementations agree on the computed pay
+            new, _ = compute_payroll(df_raw, id_rates, name_rates)
+            old = legacy_compute(df_raw, rates)
+            cols = ["ID", "Rate", "Hours", "Base Pay", "Total Pay"]
+            np.testing.assert_allclose(new[cols].to_numpy(float), old[cols].to_numpy(float), atol=0.011)
+        print(line)
+
+    # Also make sure normalization matches the scalar version used by app_logic
+    assert normalize_names(pd.Series(["Schaefer,  Emma "])).iloc[0] == "schaefer emma"
+
+
+if __name__ == "__main__":
+    main()
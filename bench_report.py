@@ -0,0 +1,126 @@
+"""
+Benchmark for the payroll Excel writer.
+
+Compares report_generator.write_payroll_report (named styles, write-only mode) against the
+original per-cell styled writer from app_logic.generate_excel_download, reporting wall clock
+time and peak traced memory.
+
+    python bench_report.py               # 2k and 50k rows
+    python bench_report.py --rows 20000 --legacy-max 20000
+
+The legacy writer is quadratic (every ws[r_idx] lookup rescans all cells for max_column),
+so by default it is only run up to 2k rows.
+"""
+import argparse
+import time
+import tracemalloc
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Font, Border, Side, Alignment
+from openpyxl.utils.dataframe import dataframe_to_rows
+
+from payroll_engine import OUTPUT_COLUMNS
+from report_generator import write_payroll_report
+
+
+def make_payroll(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Builds a processed payroll frame with the engine's output columns."""
+    rng = np.random.default_rng(seed)
+    base_pay = rng.uniform(0, 1500, n_rows).round(2)
+    cc_tips = rng.uniform(0, 1000, n_rows).round(2)
+    cash_tips = rng.uniform(0, 120, n_rows).round(2)
+    df = pd.DataFrame({
+        "ID": rng.integers(1, 200, n_rows),
+        "Name": [f"Employee{i}, Test" for i in range(n_rows)],
+        "Job Description": rng.choice(["Server", "Support", "FOH Lead", "Kitchen Staff"], n_rows),
+        "Rate": rng.choice([9.0, 10.5, 15.0], n_rows),
+        "Hours": rng.uniform(0, 80, n_rows).round(2),
+        "Base Pay": base_pay,
+        "Driver Reim.": 0.0,
+        "CC Tips": cc_tips,
+        "Cash Tips": cash_tips,
+        "Other Tips": (cc_tips + cash_tips).round(2),
+        "Total Pay": (base_pay + cc_tips + cash_tips).round(2),
+    })
+    return df[OUTPUT_COLUMNS]
+
+
+def legacy_write(df: pd.DataFrame) -> BytesIO:
+    """The original generate_excel_download: new style objects per cell, per-cell autofit."""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Payroll Report"
+    for r_idx, r in enumerate(dataframe_to_rows(df, index=False, header=True), 1):
+        ws.append(r)
+        for cell in ws[r_idx]:
+            cell.font = Font(name='Arial', size=11)
+            cell.alignment = Alignment(horizontal='left')
+            thin_border = Border(left=Side(style='thin'), right=Side(style='thin'),
+                                 top=Side(style='thin'), bottom=Side(style='thin'))
+            medium_bottom_border = Border(left=Side(style='thin'), right=Side(style='thin'),
+                                          top=Side(style='thin'), bottom=Side(style='medium'))
+            medium_top_border = Border(left=Side(style='thin'), right=Side(style='thin'),
+                                       top=Side(style='medium'), bottom=Side(style='thin'))
+            if r_idx == 1:
+                cell.font = Font(name='Arial', size=11, bold=True)
+                cell.border = medium_bottom_border
+            elif r_idx == ws.max_row:
+                cell.font = Font(name='Arial', size=11, bold=True)
+                cell.border = medium_top_border
+            else:
+                cell.font = Font(name='Arial', size=11)
+                cell.border = thin_border
+    headers = [cell.value for cell in ws[1]]
+    letters = {name: chr(64 + idx) for idx, name in enumerate(headers, 1)}
+    for row_idx in range(2, ws.max_row):
+        ws[f'{letters["Total Pay"]}{row_idx}'] = f'={letters["Base Pay"]}{row_idx}+{letters["Other Tips"]}{row_idx}'
+    for col in ws.columns:
+        max_length = max(len(str(cell.value)) for cell in col)
+        ws.column_dimensions[col[0].column_letter].width = max_length + 2
+    output = BytesIO()
+    wb.save(output)
+    output.seek(0)
+    return output
+
+
+def measure(func, df):
+    """Returns (seconds, peak MiB, output bytes); time and memory come from separate runs."""
+    start = time.perf_counter()
+    output = func(df)
+    elapsed = time.perf_counter() - start
+
+    # tracemalloc slows allocation-heavy code several-fold, so it gets its own run
+    tracemalloc.start()
+    func(df)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2 ** 20, output.getbuffer().nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[2_000, 50_000], help="payroll rows per report")
+    parser.add_argument("--legacy-max", type=int, default=2_000, help="largest size to run the legacy writer on")
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'writer':>8} {'seconds':>9} {'peak MiB':>9} {'xlsx KiB':>9}")
+    for n in args.rows:
+        df = make_payroll(n)
+        for label, func in (("new", write_payroll_report), ("legacy", legacy_write)):
+            if label == "legacy" and n > args.legacy_max:
+                print(f"{n:>8} {label:>8} {'skipped':>9}")
+                continue
+            seconds, peak, size = measure(func, df)
+            print(f"{n:>8} {label:>8} {seconds:>9.2f} {peak:>9.1f} {size / 1024:>9.0f}")
+
+        # Sanity check: the new report holds the same values and the Total Pay formulas
+        ws = load_workbook(write_payroll_report(df.head(50))).active
+        assert [c.value for c in ws[1]] == list(df.columns)
+        assert ws["K2"].value == "=F2+J2" and ws["B3"].value == df["Name"].iloc[1]
+
+
+if __name__ == "__main__":
+    main()
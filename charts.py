@@ -0,0 +1,134 @@
+# Plotly figures for long daily sales series: WebGL traces and server-side downsampling above a point threshold
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+CHART_SETTINGS = {
+    "max_line_points": 1000,   # lines with more points are LTTB-downsampled to this many and drawn with WebGL
+    "max_daily_bars": 120,     # stacked daily bars over more days than this are bucketed by week
+    "cache_entries": 32,       # built figures kept in memory, keyed by chart kind and data hash
+}
+
+ORDER_TYPE_COLORS = {
+    'Table': '#1f77b4', # Blue
+    'Pickup': '#ff7f0e', # Orange
+    'Cash & Carry': '#2ca02c', # Green
+    'Delivery': '#d62728' # Red
+}
+
+_figures = OrderedDict()
+_figures_lock = threading.Lock()
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Indices of a Largest-Triangle-Three-Buckets sample of (x, y): the first and last point plus,
+    per bucket, the point forming the largest triangle with its neighbours. Keeps peaks and dips.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = x.astype(float)
+    y = y.astype(float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)  # n_out - 2 buckets between the end points
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        # Average of the next bucket (or the last point) as the third triangle corner
+        next_stop = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x, next_y = x[stop:next_stop].mean(), y[stop:next_stop].mean()
+        areas = np.abs((x[previous] - next_x) * (y[start:stop] - y[previous])
+                       - (x[previous] - x[start:stop]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def line_trace(x, y, name: str, mode: str = 'lines+markers', **kwargs):
+    """
+    Scatter trace for a line series. Above max_line_points it keeps an LTTB sample of the
+    points, drops the markers and renders with WebGL (Scattergl).
+    """
+    x, y = pd.Index(x), np.asarray(y, dtype=float)
+    limit = CHART_SETTINGS["max_line_points"]
+    if len(y) <= limit:
+        return go.Scatter(x=x, y=y, mode=mode, name=name, **kwargs)
+    x_numeric = x.asi8 if isinstance(x, pd.DatetimeIndex) else np.arange(len(x))
+    keep = lttb(x_numeric, np.nan_to_num(y), limit)
+    return go.Scattergl(x=x[keep], y=y[keep], mode='lines', name=name, **kwargs)
+
+
+def data_hash(*frames) -> str:
+    """SHA-256 of the frames' values, index and column names."""
+    digest = hashlib.sha256()
+    for frame in frames:
+        digest.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+        digest.update("\0".join(map(str, frame.columns)).encode())
+    return digest.hexdigest()
+
+
+def cached_figure(kind: str, frames: tuple, build) -> go.Figure:
+    """build(*frames) memoized by chart kind, chart settings and data hash. Treat the returned figure as read-only."""
+    key = (kind, tuple(CHART_SETTINGS.values()), data_hash(*frames))
+    with _figures_lock:
+        figure = _figures.get(key)
+        if figure is not None:
+            _figures.move_to_end(key)
+            return figure
+
+    figure = build(*frames)
+    with _figures_lock:
+        _figures[key] = figure
+        while len(_figures) > CHART_SETTINGS["cache_entries"]:
+            _figures.popitem(last=False)
+    return figure
+
+
+def _build_daily_sales(daily: pd.DataFrame) -> go.Figure:
+    figure = go.Figure()
+    figure.add_trace(line_trace(daily.index, daily["Total Sales"], 'Daily Sales'))
+    figure.add_trace(line_trace(daily.index, daily["7d MA"], '7-Day Avg', mode='lines', line=dict(dash='dash')))
+    figure.update_layout(margin=dict(l=20, r=20, t=30, b=20), height=400,
+                         xaxis=dict(title_font_size=16, tickfont_size=14),
+                         yaxis=dict(title_font_size=16, tickfont_size=14),
+                         legend=dict(font_size=14),
+                         xaxis_title="Date", yaxis_title="Total Sales ($")
+    return figure
+
+
+def daily_sales_figure(daily: pd.DataFrame) -> go.Figure:
+    """Daily sales with the 7-day average, from the cube's "daily" frame."""
+    return cached_figure("daily_sales", (daily[["Total Sales", "7d MA"]],), _build_daily_sales)
+
+
+def _build_order_types(totals: pd.DataFrame, x_title: str) -> go.Figure:
+    figure = go.Figure()
+    for col in totals.columns:
+        figure.add_trace(go.Bar(x=totals.index, y=totals[col], name=col, marker_color=ORDER_TYPE_COLORS.get(col, '#cccccc')))
+    figure.update_layout(barmode='stack', height=400,
+                         xaxis_title=x_title, yaxis_title="Sales ($",
+                         xaxis=dict(title_font_size=16, tickfont_size=14),
+                         yaxis=dict(title_font_size=16, tickfont_size=14),
+                         legend=dict(font_size=14))
+    return figure
+
+
+def order_type_figure(cube: dict) -> tuple:
+    """
+    Stacked order-type bars from the sales cube: daily, or weekly totals when there are more
+    than max_daily_bars days. Returns (figure, "Daily" or "Weekly").
+    """
+    columns = cube["order_types"]
+    if len(cube["daily"]) > CHART_SETTINGS["max_daily_bars"]:
+        totals, bucket, x_title = cube["week"][columns], "Weekly", "Week Starting"
+    else:
+        totals, bucket, x_title = cube["daily"][columns], "Daily", "Date"
+    figure = cached_figure(f"order_types_{bucket}", (totals,), lambda frame: _build_order_types(frame, x_title))
+    return figure, bucket
@@ -0,0 +1,133 @@
+# Size-bounded on-disk cache with LRU eviction, shared by the report and AI caches
+import os
+import pickle
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+CACHE_ROOT = Path("data/cache")
+
+
+class DiskCache:
+    """
+    Pickled values stored one file per key under `directory`.
+
+    A file's mtime is its last access time, so eviction drops the least recently used
+    entries once the directory grows past `max_bytes` (or `max_entries`). Entries older
+    than `ttl` seconds are treated as misses. Writes are atomic (temp file + os.replace),
+    so several Streamlit sessions or worker processes can share one cache.
+    """
+
+    def __init__(self, directory, max_bytes: int = 100 * 2 ** 20, max_entries: int = None, ttl: float = None):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.pkl"
+
+    def get(self, key: str, default=None):
+        """Returns the cached value for key (and marks it recently used), or default on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                created, value = pickle.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return default
+        except Exception:
+            # Truncated file, or a pickle from an older pandas/numpy or a renamed class
+            # (AttributeError, ImportError, TypeError...): a miss, and the entry is dropped
+            self.delete(key)
+            self.misses += 1
+            return default
+
+        if self.ttl is not None and time.time() - created > self.ttl:
+            self.delete(key)
+            self.misses += 1
+            return default
+
+        try:
+            os.utime(path)  # Mark as recently used for LRU eviction
+        except OSError:
+            pass
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value):
+        """Stores value under key, then evicts least recently used entries over the size bound."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-", suffix=".pkl")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump((time.time(), value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def delete_prefix(self, prefix: str, keep: str = None):
+        """Removes every entry whose key starts with prefix (except `keep`)."""
+        for path in self.directory.glob(f"{prefix}*.pkl"):
+            if path.stem != keep:
+                self.delete(path.stem)
+
+    def entries(self) -> list:
+        """Returns [(path, size, last_access)] for every entry, least recently used first."""
+        entries = []
+        for path in self.directory.glob("*.pkl"):
+            if path.name.startswith(".tmp-"):
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def evict(self):
+        """Drops least recently used entries until the cache fits its size and entry bounds."""
+        with self._lock:
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+            count = len(entries)
+            for path, size, _ in entries:
+                over_size = self.max_bytes is not None and total > self.max_bytes
+                over_count = self.max_entries is not None and count > self.max_entries
+                if not over_size and not over_count:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                count -= 1
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        entries = self.entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+        }
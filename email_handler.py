@@ -1,14 +1,13 @@
-import imaplib
-import email
-from email.header import decode_header
 import os
-from io import BytesIO
 from pathlib import Path
 import streamlit as st
 from dotenv import load_dotenv
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+from imap_client import ImapSessions, download_part
+from mailbox_index import MailboxIndex
+from attachment_store import attachment_store
 
 # Load environment variables
 load_dotenv()
@@ -18,244 +17,105 @@ IMAP_SERVER = os.getenv("IMAP_SERVER", "imap.gmail.com")
 IMAP_PORT = int(os.getenv("IMAP_PORT", 993))
 SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
 SMTP_PORT = int(os.getenv("SMTP_PORT", 465))
+# One IMAP login per account, shared by every fetcher below and every Streamlit session
+imap_sessions = ImapSessions()
 
-def normalize(text):
-    try:
-        return text.encode('utf-8', errors='ignore').decode()
-    except:
-        return str(text)
-
-def download_attachment_by_filename_or_subject(filter_text, allowed_extensions=(".xlsx", ".csv")):
-    mail = None
-    try:
-        if not os.path.exists("downloads"):
-            os.makedirs("downloads")
-
-        mail = imaplib.IMAP4_SSL(IMAP_SERVER, IMAP_PORT)
-        mail.login(EMAIL_USER, EMAIL_PASS)
-        mail.select("inbox")
-
-        # Search for all emails (we'll filter by subject/filename later)
-        result, data = mail.search(None, "ALL")
-        email_ids = data[0].split()
-
-        if not email_ids:
-            st.warning(f"No emails found.")
-            return None
+def inbox(sessions=None):
+    """Context manager yielding a logged-in IMAP connection with INBOX selected (the shared one unless another pool is given)."""
+    return (sessions or imap_sessions).session(IMAP_SERVER, IMAP_PORT, EMAIL_USER, EMAIL_PASS, "INBOX")
 
-        # Process emails from newest to oldest
-        for mail_id in reversed(email_ids):
-            result, msg_data = mail.fetch(mail_id, "(RFC822)")
-            raw_email = msg_data[0][1]
-            msg = email.message_from_bytes(raw_email)
+# Local UID index of the inbox: the newest report of each type is a lookup after an incremental sync
+mailbox_index = MailboxIndex()
 
-            subject = msg.get('subject', '')
+def sync_inbox(sessions=None):
+    """Brings the mailbox index up to date with new mail. Returns messages added."""
+    with inbox(sessions) as mail:
+        return mailbox_index.sync(mail, EMAIL_USER, "INBOX")
 
-            # Check if subject contains the filter text
-            if filter_text.lower() in subject.lower():
-                st.write(f"Found email by subject: {subject} from {msg.get('from', 'Unknown Sender')}")
-                for part in msg.walk():
-                    if part.get("Content-Disposition") and "attachment" in part.get("Content-Disposition"):
-                        filename = part.get_filename()
-                        if filename and filename.lower().endswith(allowed_extensions):
-                            filepath = os.path.join("downloads", filename)
-                            with open(filepath, "wb") as f:
-                                f.write(part.get_payload(decode=True))
-                            st.write(f"Found attachment: {filename}")
-                            return filepath
-
-            # If not found in subject, check attachment filenames
-            for part in msg.walk():
-                if part.get("Content-Disposition") and "attachment" in part.get("Content-Disposition"):
-                    filename = part.get_filename()
-                    if filename and filter_text.lower() in filename.lower() and filename.lower().endswith(allowed_extensions):
-                        st.write(f"Found email by filename: {filename} from {msg.get('from', 'Unknown Sender')}")
-                        filepath = os.path.join("downloads", filename)
-                        with open(filepath, "wb") as f:
-                            f.write(part.get_payload(decode=True))
-                        st.write(f"Found attachment: {filename}")
-                        return filepath
-
-        st.warning(f"No {allowed_extensions} attachment found with '{filter_text}' in subject or filename.")
+def download_latest_report(report_type, allowed_extensions=(".xlsx",), sessions=None, sync=True):
+    """
+    Syncs the mailbox index with new mail (unless sync=False), then downloads the first attachment
+    with an allowed extension of the newest indexed message of `report_type` (see
+    mailbox_index.REPORT_TYPES). The connection is released between the sync and the download.
+    Returns (file path or None, message summary or None).
+    """
+    if sync:
+        sync_inbox(sessions)
+    message = mailbox_index.latest(EMAIL_USER, "INBOX", report_type)
+    if message is None:
+        return None, None
+    attachment = next((att for att in message["attachments"]
+                       if att["filename"].lower().endswith(allowed_extensions)), None)
+    if attachment is None:
+        return None, message
+    # A part already in the attachment store is not downloaded again
+    source = mail_source(message, attachment, message["uidvalidity"])
+    filepath = attachment_store.find_source(source["id"])
+    if filepath is None:
+        with inbox(sessions) as mail:
+            data = download_part(mail, message["uid"], attachment)
+        filepath = attachment_store.put(data, attachment["filename"], report_type=report_type, source=source)
+    return str(filepath), message
+
+def stored_latest_report(report_type, allowed_extensions=(".xlsx",)):
+    """
+    Path of the newest indexed report of `report_type` if its attachment is already in the
+    attachment store, else None. Reads only the local index and store; the server is not contacted.
+    """
+    message = mailbox_index.latest(EMAIL_USER, "INBOX", report_type)
+    if message is None:
         return None
-
-    except Exception as e:
-        st.error(f"Error fetching email with filter '{filter_text}': {str(e)}")
+    attachment = next((att for att in message["attachments"]
+                       if att["filename"].lower().endswith(allowed_extensions)), None)
+    if attachment is None:
         return None
-    finally:
-        if mail:
-            try:
-                mail.close()
-                mail.logout()
-            except:
-                pass
-
-def fetch_email_with_body_snippet(snippet, allowed_extensions=(".xlsx",)):
-    try:
-        mail = imaplib.IMAP4_SSL(IMAP_SERVER, IMAP_PORT)
-        mail.login(EMAIL_USER, EMAIL_PASS)
-        mail.select("inbox")
-
-        result, data = mail.search(None, "ALL")
-        if result != "OK":
-            print("Failed to search inbox.")
-            return None, None
-
-        mail_ids = data[0].split()[::-1]
-
-        for mail_id in mail_ids:
-            result, msg_data = mail.fetch(mail_id, "(RFC822)")
-            if result != "OK":
-                continue
-
-            raw_email = msg_data[0][1]
-            msg = email.message_from_bytes(raw_email)
-
-            # Check body for matching snippet
-            body_found = False
-            if msg.is_multipart():
-                for part in msg.walk():
-                    if part.get_content_type() == "text/plain" and not part.get_filename():
-                        try:
-                            body = part.get_payload(decode=True).decode(errors='ignore')
-                            if snippet in body:
-                                body_found = True
-                                break
-                        except:
-                            continue
-            else:
-                try:
-                    body = msg.get_payload(decode=True).decode(errors='ignore')
-                    if snippet in body:
-                        body_found = True
-                except:
-                    pass
-
-            if not body_found:
-                continue
-
-            # Return the first valid attachment
-            for part in msg.walk():
-                if part.get("Content-Disposition") and "attachment" in part.get("Content-Disposition"):
-                    filename = part.get_filename()
-                    if filename and filename.lower().endswith(allowed_extensions):
-                        return filename, BytesIO(part.get_payload(decode=True))
+    filepath = attachment_store.find_source(mail_source(message, attachment, message["uidvalidity"])["id"])
+    return str(filepath) if filepath else None
 
-        return None, None
-    except Exception as e:
-        print("❌ Error fetching email:", str(e))
-        return None, None
-    finally:
-        if mail:
-            try:
-                mail.close()
-                mail.logout()
-            except:
-                pass
+def mail_source(summary, attachment, uidvalidity=None):
+    """Attachment-store source record of a mail attachment part; its id is set only when the UIDVALIDITY is known."""
+    source = {"subject": summary["subject"], "from": summary["from"], "date": summary["date"],
+              "uid": summary["uid"], "part": attachment["part"]}
+    if uidvalidity is not None:
+        source["id"] = f"imap:{EMAIL_USER}/INBOX/{uidvalidity}/{summary['uid']}/{attachment['part']}"
+    return source
 
 def download_latest_attachment():
-    mail = None  # Initialize mail to None
     try:
-        # Ensure 'downloads' directory exists
-        if not os.path.exists("downloads"):
-            os.makedirs("downloads")
-
-        mail = imaplib.IMAP4_SSL(IMAP_SERVER, IMAP_PORT)
-        mail.login(EMAIL_USER, EMAIL_PASS)
-        mail.select("inbox")
-
-        # Search for emails containing the specific text in body
-        result, data = mail.search(None, '(BODY "The report Payroll is attached.")')
-        email_ids = data[0].split()
-
-        if not email_ids:
+        # Newest mail containing 'The report Payroll is attached.', found in the local mailbox index
+        filepath, message = download_latest_report("payroll")
+        if message is None:
             st.warning("No emails found containing 'The report Payroll is attached.'")
             return None
 
-        latest_email_id = email_ids[-1]
-        result, data = mail.fetch(latest_email_id, "(RFC822)")
-        raw_email = data[0][1]
-        msg = email.message_from_bytes(raw_email)
-
-        st.write(f"Found email: {msg.get('subject', 'No Subject')} from {msg.get('from', 'Unknown Sender')}")
-
-        for part in msg.walk():
-            if part.get_content_maintype() == "multipart":
-                continue
-            if part.get("Content-Disposition") is None:
-                continue
-            filename = part.get_filename()
-            if filename and filename.endswith(".xlsx"):
-                filepath = os.path.join("downloads", filename) # Save to downloads folder
-                with open(filepath, "wb") as f:
-                    f.write(part.get_payload(decode=True))
-                st.write(f"Found Excel attachment: {filename}")
-                return filepath
-
-        st.warning("No Excel attachment found in the email.")
-        return None
+        st.write(f"Found email: {message['subject'] or 'No Subject'} from {message['from'] or 'Unknown Sender'}")
+        if filepath is None:
+            st.warning("No Excel attachment found in the email.")
+            return None
+        st.write(f"Found Excel attachment: {os.path.basename(filepath)}")
+        return filepath
 
     except Exception as e:
         st.error(f"Error fetching email: {str(e)}")
         return None
-    finally:
-        if mail:
-            try:
-                mail.close()
-                mail.logout()
-            except:
-                pass
 
 def download_latest_sales_report():
-    mail = None
     try:
-        if not os.path.exists("downloads"):
-            os.makedirs("downloads")
-
-        mail = imaplib.IMAP4_SSL(IMAP_SERVER, IMAP_PORT)
-        mail.login(EMAIL_USER, EMAIL_PASS)
-        mail.select("inbox")
-
-        result, data = mail.search(None, '(BODY "The report History Sales Overview is attached.")')
-        email_ids = data[0].split()
-
-        if not email_ids:
+        filepath, message = download_latest_report("sales")
+        if message is None:
             st.warning("No emails found containing 'The report History Sales Overview is attached.'")
             return None
 
-        latest_email_id = email_ids[-1]
-        result, data = mail.fetch(latest_email_id, "(RFC822)")
-        raw_email = data[0][1]
-        msg = email.message_from_bytes(raw_email)
-
-        st.write(f"Found sales email: {msg.get('subject', 'No Subject')} from {msg.get('from', 'Unknown Sender')}")
-
-        for part in msg.walk():
-            if part.get_content_maintype() == "multipart":
-                continue
-            if part.get("Content-Disposition") is None:
-                continue
-            filename = part.get_filename()
-            if filename and filename.lower().endswith(".xlsx"):
-                filepath = os.path.join("downloads", filename)
-                with open(filepath, "wb") as f:
-                    f.write(part.get_payload(decode=True))
-                st.write(f"Found Excel sales attachment: {filename}")
-                return filepath
-
-        st.warning("No Excel sales attachment found in the email.")
-        return None
+        st.write(f"Found sales email: {message['subject'] or 'No Subject'} from {message['from'] or 'Unknown Sender'}")
+        if filepath is None:
+            st.warning("No Excel sales attachment found in the email.")
+            return None
+        st.write(f"Found Excel sales attachment: {os.path.basename(filepath)}")
+        return filepath
 
     except Exception as e:
         st.error(f"Error fetching sales email: {str(e)}")
         return None
-    finally:
-        if mail:
-            try:
-                mail.close()
-                mail.logout()
-            except:
-                pass
 
 def generate_financial_summary_email(summary_text: str, recipient_email: str, subject: str = "Financial Summary Report", email_body_content: str = "") -> bool:
     """
@@ -302,17 +162,13 @@ Preview: {preview}
 def download_latest_menu_sales_report():
     """Downloads the latest menu sales analysis Excel file from email."""
     st.info("Attempting to download latest menu sales report...")
-    filter_text = "The report Menu Sales Analysis is attached."
-    filename, file_data = fetch_email_with_body_snippet(filter_text, allowed_extensions=(".xlsx",))
-    if filename and file_data:
-        # Ensure downloads directory exists
-        if not os.path.exists("downloads"):
-            os.makedirs("downloads")
-        
-        # Save the file
-        filepath = os.path.join("downloads", filename)
-        with open(filepath, "wb") as f:
-            f.write(file_data.getvalue())
-        st.success(f"Downloaded menu sales report: {filename}")
+    try:
+        # Newest mail containing 'The report Menu Sales Analysis is attached.', from the mailbox index
+        filepath, _ = download_latest_report("menu")
+    except Exception as e:
+        st.error(f"Error fetching email: {str(e)}")
+        return None
+    if filepath:
+        st.success(f"Downloaded menu sales report: {os.path.basename(filepath)}")
         return filepath
     return None
@@ -0,0 +1,136 @@
+# Single-read workbook loading and header detection shared by the report parsers
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from attachment_store import content_hash
+from disk_cache import CACHE_ROOT, DiskCache
+from utils import bytes_sha256
+
+# Keyword profiles used to sniff the header row of each report type.
+# keywords/min_matches: how many of the keywords must appear as cells of the row
+# min_non_empty: at least this many non-empty cells (used when there are no keywords)
+# search_rows: only the first N rows are searched (None searches the whole sheet)
+# search_start: rows before this index are skipped
+HEADER_PROFILES = {
+    "payroll": {"keywords": ["ID", "Name", "Base Pay", "Total Pay"], "min_matches": 4, "search_rows": 20},
+    "menu": {"min_non_empty": 4, "search_rows": None},
+    "schedule": {"keywords": ["MON", "TUES", "WED", "THURS", "FRI", "SAT", "SUN"], "min_matches": 3,
+                 "uppercase": True, "search_rows": None},
+    "sales": {"keywords": ["Date"], "min_matches": 1, "search_start": 5, "search_rows": 15},
+}
+
+# Parsed sheets keyed by workbook SHA-256 + sheet, so a workbook is only parsed from XML once.
+# Entries are pickled DataFrames: raw sheets are header-less object columns mixing text, numbers
+# and datetimes, which Feather/Parquet (pyarrow isn't a dependency) or SQLite columns can't hold
+# without casting. Keys carry the pandas version, since pickles don't load across versions, and
+# bump INGEST_CACHE_VERSION when read_sheet's output changes.
+INGEST_CACHE_VERSION = 1
+ingest_cache = DiskCache(CACHE_ROOT / "ingest", max_bytes=200 * 2 ** 20)
+
+
+def _convert_cell(value):
+    """Converts a raw openpyxl value the way pandas.read_excel does (blank -> NaN, 5.0 -> 5)."""
+    if value is None or value == "":
+        return np.nan
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _infer_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Infers column dtypes like the pandas Excel parser (all-numeric columns, incl. numeric text, become numbers)."""
+    df = df.infer_objects()
+    for col in df.columns[df.dtypes == object]:
+        try:
+            df[col] = pd.to_numeric(df[col])
+        except (ValueError, TypeError):
+            continue
+    return df
+
+
+def _parse_sheet(file_path, sheet_name=None) -> pd.DataFrame:
+    """Streams one worksheet in openpyxl read_only mode into a header-less DataFrame."""
+    wb = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb[sheet_name] if sheet_name else wb.worksheets[0]
+        rows = [[_convert_cell(value) for value in row] for row in ws.iter_rows(values_only=True)]
+    finally:
+        wb.close()
+
+    # Drop trailing empty rows and columns (read_only mode reports the sheet's declared dimensions)
+    while rows and all(pd.isna(value) for value in rows[-1]):
+        rows.pop()
+    df_raw = pd.DataFrame(rows)
+    non_empty_cols = np.flatnonzero(df_raw.notna().any().to_numpy())
+    if len(non_empty_cols):
+        df_raw = df_raw.iloc[:, :non_empty_cols[-1] + 1]
+    return _infer_columns(df_raw)
+
+
+def read_sheet(file_path, sheet_name=None, use_cache: bool = True) -> pd.DataFrame:
+    """
+    Returns one worksheet as a header-less DataFrame, equivalent to
+    pd.read_excel(file_path, sheet_name=sheet_name, header=None).
+
+    The parsed sheet is cached by the workbook's content hash, so re-opening the same report
+    (under any file name) skips the XML parse.
+    """
+    if not use_cache:
+        return _parse_sheet(file_path, sheet_name)
+
+    sheet_key = bytes_sha256(str(sheet_name).encode())[:12] if sheet_name else "first"
+    key = f"{content_hash(file_path)}-{sheet_key}-pd{pd.__version__}-v{INGEST_CACHE_VERSION}"
+    df_raw = ingest_cache.get(key)
+    if df_raw is None:
+        df_raw = _parse_sheet(file_path, sheet_name)
+        ingest_cache.set(key, df_raw)
+    return df_raw
+
+
+def find_header_row(df_raw: pd.DataFrame, report_type: str) -> int:
+    """Finds the header row of a raw sheet using the report type's keyword profile. Returns -1 if not found."""
+    profile = HEADER_PROFILES[report_type]
+    search_start = profile.get("search_start", 0)
+    search_rows = profile.get("search_rows") or len(df_raw)
+    keywords = profile.get("keywords")
+
+    rows = df_raw.iloc[search_start:search_rows].itertuples(index=False, name=None)
+    for i, row in enumerate(rows, search_start):
+        values = [value for value in row if pd.notna(value)]
+        if keywords:
+            cells = {str(value).strip() for value in values}
+            if profile.get("uppercase"):
+                cells = {cell.upper() for cell in cells}
+            if sum(1 for keyword in keywords if keyword in cells) >= profile["min_matches"]:
+                return i
+        elif len(values) >= profile["min_non_empty"]:
+            return i
+    return -1
+
+
+def frame_from_header(df_raw: pd.DataFrame, header_row_index: int) -> pd.DataFrame:
+    """
+    Slices the data region below the header row without re-parsing the workbook.
+    Column names follow pd.read_excel(header=...): blanks become 'Unnamed: <n>' and duplicates get '.1', '.2'.
+    """
+    columns = []
+    seen = {}
+    for col_idx, value in enumerate(df_raw.iloc[header_row_index].tolist()):
+        name = f"Unnamed: {col_idx}" if pd.isna(value) else value
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+
+    df = df_raw.iloc[header_row_index + 1:].reset_index(drop=True)
+    df.columns = columns
+    return _infer_columns(df)
+
+
+def load_report(file_path, report_type: str, sheet_name=None) -> tuple:
+    """Reads a report workbook once and detects its header row. Returns (df_raw, header_row_index)."""
+    df_raw = read_sheet(file_path, sheet_name=sheet_name)
+    return df_raw, find_header_row(df_raw, report_type)
@@ -0,0 +1,317 @@
+# IMAP helpers: UID searches, header + BODYSTRUCTURE summaries and single-attachment downloads
+import atexit
+import base64
+import email
+import imaplib
+import quopri
+import re
+import threading
+import time
+from contextlib import contextmanager
+from email.header import decode_header, make_header
+from email.utils import collapse_rfc2231_value, decode_rfc2231
+
+# Header fields fetched (with BODYSTRUCTURE) to pick a message without downloading it
+HEADER_FIELDS = "SUBJECT FROM DATE"
+FETCH_BATCH = 50  # messages summarized per UID FETCH
+NOOP_AFTER = 30  # seconds a pooled connection may sit idle before it is health-checked with NOOP
+
+_LITERAL = re.compile(rb"\{\d+\}$")
+
+
+def quote(text: str) -> str:
+    """IMAP quoted string."""
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _tokens(data) -> list:
+    """Flat token list of an imaplib response: '(' / ')', str atoms and quoted strings, None for NIL, bytes literals."""
+    tokens = []
+    for item in data:
+        if item is None:
+            continue
+        if isinstance(item, tuple):
+            raw, literal = item
+            _tokenize(_LITERAL.sub(b"", raw.rstrip()), tokens)
+            tokens.append(literal)
+        else:
+            _tokenize(item, tokens)
+    return tokens
+
+
+def _tokenize(raw: bytes, tokens: list) -> None:
+    i, n = 0, len(raw)
+    while i < n:
+        c = raw[i:i + 1]
+        if c in b" \r\n":
+            i += 1
+        elif c in b"()":
+            tokens.append(c.decode())
+            i += 1
+        elif c == b'"':
+            i += 1
+            value = bytearray()
+            while i < n and raw[i:i + 1] != b'"':
+                if raw[i:i + 1] == b"\\":
+                    i += 1
+                value += raw[i:i + 1]
+                i += 1
+            tokens.append(value.decode("utf-8", errors="replace"))
+            i += 1
+        else:
+            start = i
+            while i < n and raw[i:i + 1] not in b' ()"\r\n':
+                if raw[i:i + 1] == b"[":  # section specs such as BODY[HEADER.FIELDS (SUBJECT)] contain spaces and parens
+                    i = raw.find(b"]", i) + 1 or n
+                else:
+                    i += 1
+            atom = raw[start:i].decode("utf-8", errors="replace")
+            tokens.append(None if atom.upper() == "NIL" else atom)
+
+
+def parse_response(data) -> list:
+    """imaplib response data as nested lists."""
+    root = []
+    stack = [root]
+    for token in _tokens(data):
+        if token == "(":
+            stack.append([])
+        elif token == ")":
+            if len(stack) > 1:
+                finished = stack.pop()
+                stack[-1].append(finished)
+        else:
+            stack[-1].append(token)
+    return root
+
+
+def fetch_items(data) -> list:
+    """The {ITEM: value} dict of every message in a FETCH response (keys upper-cased)."""
+    messages = []
+    for item in parse_response(data):
+        if isinstance(item, list):
+            messages.append({str(key).upper(): value for key, value in zip(item[::2], item[1::2])})
+    return messages
+
+
+def decode_text(value) -> str:
+    """Header value with RFC 2047 encoded words decoded."""
+    if value is None:
+        return ""
+    try:
+        return str(make_header(decode_header(str(value))))
+    except Exception:
+        return str(value)
+
+
+def _params(values) -> dict:
+    """BODYSTRUCTURE parameter list -> {lower-case name: decoded value}."""
+    params = {}
+    if isinstance(values, list):
+        for key, value in zip(values[::2], values[1::2]):
+            key = str(key).lower()
+            value = value.decode(errors="replace") if isinstance(value, bytes) else value
+            if key.endswith("*"):  # RFC 2231: charset'language'percent-encoded
+                key = key[:-1]
+                value = collapse_rfc2231_value(decode_rfc2231(value))
+            params[key] = decode_text(value)
+    return params
+
+
+def leaf_parts(structure, prefix: str = "") -> list:
+    """
+    Leaf parts of a BODYSTRUCTURE as dicts with "part" (section number), "type" ('text/plain'...),
+    "filename" ('' when none), "disposition" ('attachment'/'inline'/''), "encoding" and "size".
+    """
+    if not isinstance(structure, list) or not structure:
+        return []
+    if isinstance(structure[0], list):  # multipart: child parts come first, then the subtype
+        parts = []
+        for number, child in enumerate(_leading_lists(structure)):
+            parts.extend(leaf_parts(child, f"{prefix}{number + 1}."))
+        return parts
+
+    main_type, sub_type = str(structure[0]).lower(), str(structure[1]).lower()
+    extension = 7 + (1 if main_type == "text" else 0) + (3 if (main_type, sub_type) == ("message", "rfc822") else 0)
+    disposition = structure[extension + 1] if len(structure) > extension + 1 else None
+    disposition_type, disposition_params = "", {}
+    if isinstance(disposition, list) and disposition:
+        disposition_type = str(disposition[0]).lower()
+        disposition_params = _params(disposition[1] if len(disposition) > 1 else None)
+    filename = disposition_params.get("filename") or _params(structure[2]).get("name") or ""
+    return [{"part": prefix.rstrip(".") or "1", "type": f"{main_type}/{sub_type}", "filename": filename,
+             "disposition": disposition_type, "encoding": str(structure[5] or "7bit").lower(),
+             "size": int(structure[6] or 0)}]
+
+
+def attachment_parts(structure) -> list:
+    """leaf_parts that carry a file name."""
+    return [part for part in leaf_parts(structure) if part["filename"]]
+
+
+def _leading_lists(structure: list) -> list:
+    children = []
+    for item in structure:
+        if not isinstance(item, list):
+            break
+        children.append(item)
+    return children
+
+
+def search_uids(mail, *criteria) -> list:
+    """UIDs (ints, ascending) matching a UID SEARCH; ALL when no criteria are given."""
+    result, data = mail.uid("SEARCH", None, *(criteria or ("ALL",)))
+    if result != "OK" or not data or not data[0]:
+        return []
+    return sorted(int(uid) for uid in data[0].split())
+
+
+def summarize(items: dict) -> dict:
+    """Message summary from a FETCH item dict: uid, subject, from, date, attachments, text_part (first plain-text body part)."""
+    header = next((value for key, value in items.items() if key.startswith("BODY[HEADER")), b"")
+    headers = email.message_from_bytes(header if isinstance(header, bytes) else str(header or "").encode())
+    return {
+        "uid": int(items["UID"]),
+        "subject": decode_text(headers.get("Subject")),
+        "from": decode_text(headers.get("From")),
+        "date": headers.get("Date", ""),
+        "attachments": attachment_parts(items.get("BODYSTRUCTURE")),
+        "text_part": next((part for part in leaf_parts(items.get("BODYSTRUCTURE"))
+                           if part["type"] == "text/plain" and not part["filename"]), None),
+    }
+
+
+def fetch_summaries(mail, uids, batch: int = FETCH_BATCH):
+    """Yields summarize() for each UID in the given order, fetching headers and BODYSTRUCTURE in batches."""
+    uids = list(uids)
+    for start in range(0, len(uids), batch):
+        chunk = uids[start:start + batch]
+        result, data = mail.uid("FETCH", ",".join(map(str, chunk)),
+                                f"(UID BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS ({HEADER_FIELDS})])")
+        if result != "OK":
+            continue
+        by_uid = {}
+        for items in fetch_items(data):
+            if "UID" in items:
+                by_uid[int(items["UID"])] = summarize(items)
+        for uid in chunk:
+            if uid in by_uid:
+                yield by_uid[uid]
+
+
+def _decode(payload, encoding: str, partial: bool = False) -> bytes:
+    payload = payload if isinstance(payload, bytes) else str(payload or "").encode()
+    if encoding == "base64":
+        payload = re.sub(rb"\s+", b"", payload)
+        if partial:
+            payload = payload[:len(payload) // 4 * 4]
+        return base64.b64decode(payload)
+    if encoding == "quoted-printable":
+        return quopri.decodestring(payload)
+    return payload
+
+
+def fetch_text_snippets(mail, parts: dict, length: int = 1024) -> dict:
+    """First `length` bytes of a text part per message, decoded: {uid: text} for {uid: leaf part}. One FETCH per part number."""
+    by_section = {}
+    for uid, part in parts.items():
+        by_section.setdefault(part["part"], []).append(uid)
+    snippets = {}
+    for section, uids in by_section.items():
+        for start in range(0, len(uids), FETCH_BATCH):
+            chunk = uids[start:start + FETCH_BATCH]
+            result, data = mail.uid("FETCH", ",".join(map(str, chunk)), f"(UID BODY.PEEK[{section}]<0.{length}>)")
+            if result != "OK":
+                continue
+            for items in fetch_items(data):
+                uid = int(items.get("UID", 0))
+                payload = next((value for key, value in items.items() if key.startswith("BODY[")), b"")
+                if uid in parts:
+                    try:
+                        snippets[uid] = _decode(payload, parts[uid]["encoding"], partial=True).decode("utf-8", errors="ignore")
+                    except ValueError:
+                        snippets[uid] = ""
+    return snippets
+
+
+def download_part(mail, uid: int, attachment: dict) -> bytes:
+    """Downloads and decodes one attachment part (from attachment_parts) of a message."""
+    result, data = mail.uid("FETCH", str(uid), f"(BODY.PEEK[{attachment['part']}])")
+    if result != "OK":
+        raise RuntimeError(f"Could not fetch part {attachment['part']} of message {uid}")
+    items = fetch_items(data)
+    payload = next((value for key, value in items[0].items() if key.startswith("BODY[")), b"") if items else b""
+    return _decode(payload, attachment["encoding"])
+
+
+class ImapSessions:
+    """
+    One authenticated IMAP4_SSL connection per (server, port, user), shared by every caller in
+    the process (all fetchers and Streamlit sessions).
+
+    `session()` hands out the connection with the mailbox selected, one caller at a time per
+    account. A connection idle for more than NOOP_AFTER seconds is checked with NOOP first, and a
+    dead one (or one that failed mid-command) is replaced by a fresh login on the next checkout.
+    """
+
+    def __init__(self, connect=imaplib.IMAP4_SSL):
+        self._connect = connect
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.logins = 0
+        atexit.register(self.close_all)
+
+    def _entry(self, key) -> dict:
+        with self._lock:
+            return self._entries.setdefault(key, {"lock": threading.Lock(), "mail": None, "mailbox": None, "used": 0.0})
+
+    def _healthy(self, entry) -> bool:
+        if entry["mail"] is None:
+            return False
+        if time.monotonic() - entry["used"] < NOOP_AFTER:
+            return True
+        try:
+            return entry["mail"].noop()[0] == "OK"
+        except (imaplib.IMAP4.error, OSError):
+            return False
+
+    @contextmanager
+    def session(self, server: str, port: int, user: str, password: str, mailbox: str = "INBOX"):
+        """The account's shared connection with `mailbox` selected, reconnecting if it went stale."""
+        entry = self._entry((server, port, user))
+        with entry["lock"]:
+            if not self._healthy(entry):
+                self._drop(entry)
+                mail = self._connect(server, port)
+                mail.login(user, password)
+                self.logins += 1
+                entry["mail"] = mail
+            mail = entry["mail"]
+            try:
+                if entry["mailbox"] != mailbox.upper():
+                    result, _ = mail.select(mailbox)
+                    if result != "OK":
+                        raise imaplib.IMAP4.error(f"Could not select mailbox {mailbox}")
+                    entry["mailbox"] = mailbox.upper()
+                yield mail
+            except (imaplib.IMAP4.abort, OSError):
+                self._drop(entry)  # the link is gone; the next checkout logs in again
+                raise
+            finally:
+                entry["used"] = time.monotonic()
+
+    def _drop(self, entry) -> None:
+        mail, entry["mail"], entry["mailbox"] = entry["mail"], None, None
+        if mail is not None:
+            try:
+                mail.logout()
+            except Exception:
+                pass
+
+    def close_all(self) -> None:
+        """Logs out of every pooled connection."""
+        with self._lock:
+            entries = list(self._entries.values())
+        for entry in entries:
+            with entry["lock"]:
+                self._drop(entry)
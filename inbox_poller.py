@@ -0,0 +1,170 @@
+"""
+Background inbox poller: keeps the newest emailed reports downloaded and their caches warm.
+
+Every INBOX_POLL_SECONDS it syncs the mailbox index, stores the newest payroll, sales, menu and
+schedule attachments through email_handler, and runs the matching parser on each report it has
+not warmed yet, so the dashboards open on already-parsed data. It runs as a daemon thread in the
+Streamlit app when INBOX_POLLER=1 is set (start_inbox_poller), or as its own process:
+
+    python inbox_poller.py             # poll until stopped
+    python inbox_poller.py --once      # one pass, e.g. from cron
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from app_logic import process_payroll_report
+from attachment_store import content_hash
+from email_handler import download_latest_report, sync_inbox
+from excel_loader import load_report
+from imap_client import ImapSessions
+from payroll_batch import REPORTS_DIR, payroll_period
+from reporters import LogReporter
+from sales_handler import load_sales_report, record_sales_history, refresh_sales_monitor
+
+POLL_SECONDS = int(os.getenv("INBOX_POLL_SECONDS", 300))
+
+logger = logging.getLogger("inbox_poller")
+
+
+def warm_payroll(file_path) -> None:
+    """Processed payroll in the result cache and Payroll History, report written to data/reports/."""
+    start, end = payroll_period(file_path)
+    label = f"{start:%Y%m%d}_{end:%Y%m%d}" if start else Path(file_path).stem
+    REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+    process_payroll_report(file_path, reporter=LogReporter(logger),
+                           output_filename=str(REPORTS_DIR / f"Payroll_Report_{label}.xlsx"))
+
+
+def warm_sales(file_path) -> None:
+    """Parsed sales model and cube, the report's days in the sales history and the anomaly monitor."""
+    record_sales_history(load_sales_report(file_path), source=os.path.basename(file_path))
+    refresh_sales_monitor()
+
+
+def warm_menu(file_path) -> None:
+    """Menu sheet in the ingest cache."""
+    load_report(file_path, "menu", sheet_name='Sheet1')
+
+
+def warm_schedule(file_path) -> None:
+    """Schedule sheet in the ingest cache."""
+    load_report(file_path, "schedule")
+
+
+# Parser run for each report type once a new attachment of that type is stored
+WARMERS = {
+    "payroll": warm_payroll,
+    "sales": warm_sales,
+    "menu": warm_menu,
+    "schedule": warm_schedule,
+}
+
+
+class InboxPoller:
+    """
+    Polls the inbox every `interval` seconds on a daemon thread.
+
+    The poller logs in on its own connection, so interactive fetches never queue behind a
+    pass. Each pass syncs the mailbox index once (a SELECT when nothing arrived) and warms a
+    report once per file content (tracked by hash in `warmed`). Failures are logged and kept
+    in `errors`; the next pass retries.
+    """
+
+    def __init__(self, interval: int = POLL_SECONDS, warmers: dict = None):
+        self.interval = interval
+        self.warmers = warmers or WARMERS
+        self.warmed = {}  # report type -> hash of the last warmed file
+        self.errors = {}
+        self.last_poll = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.sessions = ImapSessions()
+
+    def poll_once(self) -> dict:
+        """Fetches and warms the newest report of each type. Returns {report type: path} of reports warmed in this pass."""
+        refreshed = {}
+        try:
+            sync_inbox(self.sessions)
+        except Exception as e:
+            self.errors["sync"] = str(e)
+            logger.warning(f"Syncing the inbox failed: {e}")
+            self.last_poll = time.time()
+            return refreshed
+        self.errors.pop("sync", None)
+        for report_type, warm in self.warmers.items():
+            try:
+                file_path, _ = download_latest_report(report_type, sessions=self.sessions, sync=False)
+                if file_path is None:
+                    continue
+                digest = content_hash(file_path)
+                if self.warmed.get(report_type) == digest:
+                    continue
+                warm(file_path)
+                self.warmed[report_type] = digest
+                self.errors.pop(report_type, None)
+                refreshed[report_type] = file_path
+                logger.info(f"Warmed {report_type} report {os.path.basename(file_path)}")
+            except Exception as e:
+                self.errors[report_type] = str(e)
+                logger.warning(f"Polling {report_type} reports failed: {e}")
+        self.last_poll = time.time()
+        return refreshed
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.poll_once()
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        """Starts the polling thread unless it is already running."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="inbox-poller", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the polling thread after its current pass."""
+        self._stop.set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+
+inbox_poller = InboxPoller()
+
+
+def start_inbox_poller() -> InboxPoller:
+    """Starts the process-wide poller (once, however often it is called) when INBOX_POLLER=1 is set."""
+    if os.getenv("INBOX_POLLER", "0") == "1":
+        inbox_poller.start()
+    return inbox_poller
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--once", action="store_true", help="run one pass and exit")
+    parser.add_argument("--interval", type=int, default=POLL_SECONDS, help="seconds between passes")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    poller = InboxPoller(args.interval)
+    if args.once:
+        for report_type, file_path in poller.poll_once().items():
+            print(f"{report_type}: {file_path}")
+        return
+    try:
+        poller._run()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
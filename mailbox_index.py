@@ -0,0 +1,193 @@
+# Local index of the report mailbox keyed by UIDVALIDITY/UID, synced incrementally from IMAP
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+from imap_client import fetch_summaries, fetch_text_snippets, quote, search_uids
+
+MAILBOX_INDEX_DB = Path("data/mailbox_index.sqlite")
+
+# How each report type is recognized: a sentence in the mail body, or text in the subject or attachment name.
+# Only messages with an attachment of one of the extensions are classified.
+REPORT_TYPES = {
+    "payroll": {"body": "The report Payroll is attached.", "extensions": (".xlsx",)},
+    "sales": {"body": "The report History Sales Overview is attached.", "extensions": (".xlsx",)},
+    "menu": {"body": "The report Menu Sales Analysis is attached.", "extensions": (".xlsx",)},
+    "schedule": {"subject_or_filename": "ROSATI'S EMPLOYEE SCHEDULE", "extensions": (".xlsx",)},
+}
+REPORT_EXTENSIONS = tuple(sorted({ext for rule in REPORT_TYPES.values() for ext in rule["extensions"]}))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mailboxes (
+    account TEXT NOT NULL,
+    mailbox TEXT NOT NULL,
+    uidvalidity INTEGER NOT NULL,
+    last_uid INTEGER NOT NULL,
+    synced_at TEXT NOT NULL,
+    PRIMARY KEY (account, mailbox)
+);
+CREATE TABLE IF NOT EXISTS messages (
+    account TEXT NOT NULL,
+    mailbox TEXT NOT NULL,
+    uidvalidity INTEGER NOT NULL,
+    uid INTEGER NOT NULL,
+    subject TEXT,
+    sender TEXT,
+    sent_at TEXT,
+    attachments TEXT,
+    report_type TEXT,
+    PRIMARY KEY (account, mailbox, uidvalidity, uid)
+);
+CREATE INDEX IF NOT EXISTS idx_messages_report ON messages (account, mailbox, report_type, uid);
+"""
+
+
+def classify(summary: dict, body_snippet: str = "", body_types=()) -> str:
+    """
+    Report type of a message summary (see REPORT_TYPES), or None. A body rule matches when its
+    sentence is in `body_snippet` or its type is in `body_types` (matched by a server-side search).
+    """
+    names = [att["filename"].lower() for att in summary["attachments"]]
+    for report_type, rule in REPORT_TYPES.items():
+        if not any(name.endswith(rule["extensions"]) for name in names):
+            continue
+        if "body" in rule and (rule["body"] in body_snippet or report_type in body_types):
+            return report_type
+        if "subject_or_filename" in rule:
+            needle = rule["subject_or_filename"].lower()
+            if needle in summary["subject"].lower() or any(needle in name for name in names):
+                return report_type
+    return None
+
+
+def _iso_date(value: str) -> str:
+    try:
+        return parsedate_to_datetime(value).isoformat()
+    except (TypeError, ValueError):
+        return None
+
+
+class MailboxIndex:
+    """
+    Messages of a mailbox (subject, sender, date, attachment parts and report type) in SQLite,
+    keyed by account, mailbox, UIDVALIDITY and UID.
+
+    `sync` asks the server only for UIDs above the last one indexed, so its cost follows new
+    mail, not mailbox size; the first sync covers the whole mailbox. A changed
+    UIDVALIDITY means the server renumbered the mailbox, and the index for it is rebuilt.
+    `latest` answers "newest message of this report type" without touching the server.
+    """
+
+    def __init__(self, path=MAILBOX_INDEX_DB):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Connection that commits on success, rolls back on error and is always closed."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def state(self, account: str, mailbox: str) -> tuple:
+        """(uidvalidity, last_uid) indexed for a mailbox, or (None, 0)."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT uidvalidity, last_uid FROM mailboxes WHERE account = ? AND mailbox = ?",
+                               (account, mailbox)).fetchone()
+        return row if row else (None, 0)
+
+    def sync(self, mail, account: str, mailbox: str = "INBOX") -> int:
+        """Indexes messages newer than the last indexed UID, selecting `mailbox` on the connection. Returns messages added."""
+        uidvalidity, uidnext = select_status(mail, mailbox)
+
+        with self._lock:
+            known_validity, last_uid = self.state(account, mailbox)
+            if known_validity != uidvalidity:
+                last_uid = 0
+                with self._connect() as conn:
+                    conn.execute("DELETE FROM messages WHERE account = ? AND mailbox = ?", (account, mailbox))
+            if uidnext is not None and uidnext - 1 <= last_uid:
+                self._save_state(account, mailbox, uidvalidity, last_uid)
+                return 0
+
+            criteria = ("UID", f"{last_uid + 1}:*") if last_uid else ()
+            new_uids = [uid for uid in search_uids(mail, *criteria) if uid > last_uid]
+            summaries = list(fetch_summaries(mail, new_uids))
+
+            # Only messages with a report-like attachment are classified. The first KB of the plain-text
+            # body settles most; the rest (HTML-only mail, sentence further down) are searched on the server.
+            candidates = [s for s in summaries
+                          if any(att["filename"].lower().endswith(REPORT_EXTENSIONS) for att in s["attachments"])]
+            snippets = fetch_text_snippets(mail, {s["uid"]: s["text_part"] for s in candidates if s["text_part"]})
+            unmatched = [s["uid"] for s in candidates if classify(s, snippets.get(s["uid"], "")) is None]
+            body_types = search_body_types(mail, unmatched) if unmatched else {}
+
+            rows = [(account, mailbox, uidvalidity, s["uid"], s["subject"], s["from"], _iso_date(s["date"]),
+                     json.dumps(s["attachments"]),
+                     classify(s, snippets.get(s["uid"], ""), body_types.get(s["uid"], ()))) for s in summaries]
+            with self._connect() as conn:
+                conn.executemany("INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            # Every UID below UIDNEXT has been seen (or was deleted)
+            seen_through = max([last_uid, *new_uids] + ([uidnext - 1] if uidnext else []))
+            self._save_state(account, mailbox, uidvalidity, seen_through)
+        return len(rows)
+
+    def _save_state(self, account, mailbox, uidvalidity, last_uid) -> None:
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO mailboxes VALUES (?, ?, ?, ?, ?)",
+                         (account, mailbox, uidvalidity, last_uid, datetime.now().isoformat(timespec="seconds")))
+
+    def latest(self, account: str, mailbox: str, report_type: str) -> dict:
+        """Newest indexed message of a report type with its UIDVALIDITY and attachments (list of part dicts), or None."""
+        uidvalidity, _ = self.state(account, mailbox)
+        with self._connect() as conn:
+            row = conn.execute("""
+                SELECT uid, subject, sender, sent_at, attachments FROM messages
+                WHERE account = ? AND mailbox = ? AND uidvalidity = ? AND report_type = ?
+                ORDER BY uid DESC LIMIT 1""", (account, mailbox, uidvalidity, report_type)).fetchone()
+        if row is None:
+            return None
+        uid, subject, sender, sent_at, attachments = row
+        return {"uidvalidity": uidvalidity, "uid": uid, "subject": subject, "from": sender, "date": sent_at, "attachments": json.loads(attachments)}
+
+
+def select_status(mail, mailbox: str) -> tuple:
+    """
+    (UIDVALIDITY, UIDNEXT or None) from a fresh SELECT of the mailbox. STATUS is not used on
+    the selected mailbox, which some servers answer with stale values or refuse.
+    """
+    for code in ("UIDVALIDITY", "UIDNEXT"):
+        mail.response(code)  # drop values left over from an earlier SELECT on this connection
+    result, _ = mail.select(mailbox)
+    if result != "OK":
+        raise RuntimeError(f"Could not select mailbox {mailbox}")
+    values = {}
+    for code in ("UIDVALIDITY", "UIDNEXT"):
+        _, data = mail.response(code)
+        data = [item for item in data or [] if item is not None]
+        values[code] = int(data[-1]) if data else None
+    if values["UIDVALIDITY"] is None:
+        raise RuntimeError(f"The server sent no UIDVALIDITY for mailbox {mailbox}")
+    return values["UIDVALIDITY"], values["UIDNEXT"]
+
+
+def search_body_types(mail, uids, batch: int = 500) -> dict:
+    """{uid: {report types}} for the given UIDs whose body contains a REPORT_TYPES sentence (server-side BODY search)."""
+    matches = {}
+    for start in range(0, len(uids), batch):
+        uid_set = ",".join(map(str, uids[start:start + batch]))
+        for report_type, rule in REPORT_TYPES.items():
+            if "body" in rule:
+                for uid in search_uids(mail, "UID", uid_set, "BODY", quote(rule["body"])):
+                    matches.setdefault(uid, set()).add(report_type)
+    return matches
@@ -6,6 +6,8 @@ from pathlib import Path
 import google.generativeai as genai
 import os
 from dotenv import load_dotenv
+from excel_loader import load_report, frame_from_header
+from ai_client import generate_text, stream_text
 
 # Load environment variables
 load_dotenv()
@@ -13,20 +15,19 @@ load_dotenv()
 # Initialize Gemini
 genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
-def generate_ai_analysis(df: pd.DataFrame, metrics: dict, date_range: tuple = None) -> str:
-    """Generate AI-powered analysis using Google's Gemini."""
-    try:
-        # Prepare data for analysis
-        top_items = df.nlargest(5, 'Total Sales')[['Item Name', 'Quantity', 'Total Sales', 'Price']]
-        bottom_items = df.nsmallest(5, 'Total Sales')[['Item Name', 'Quantity', 'Total Sales', 'Price']]
-        
-        # Calculate additional metrics
-        total_items = len(df)
-        avg_price = metrics['avg_price']
-        total_sales = metrics['total_sales']
-        
-        # Create prompt for Gemini
-        prompt = f"""As an investment banking analyst specializing in restaurant operations, provide a detailed analysis and recommendations based on the following menu sales data:
+def menu_analysis_prompt(df: pd.DataFrame, metrics: dict, date_range: tuple) -> str:
+    """Gemini prompt for the menu analysis of a report period."""
+    # Prepare data for analysis
+    top_items = df.nlargest(5, 'Total Sales')[['Item Name', 'Quantity', 'Total Sales', 'Price']]
+    bottom_items = df.nsmallest(5, 'Total Sales')[['Item Name', 'Quantity', 'Total Sales', 'Price']]
+
+    # Calculate additional metrics
+    total_items = len(df)
+    avg_price = metrics['avg_price']
+    total_sales = metrics['total_sales']
+
+    # Create prompt for Gemini
+    return f"""As an investment banking analyst specializing in restaurant operations, provide a detailed analysis and recommendations based on the following menu sales data:
 
 Period: {date_range[0].strftime('%B %d, %Y')} to {date_range[1].strftime('%B %d, %Y')}
 
@@ -51,21 +52,26 @@ Please provide:
 
 Format the response in a professional, investment banking style with clear sections and bullet points where appropriate."""
 
-        # Call Gemini API
-        model = genai.GenerativeModel('gemini-1.5-pro-latest')
-        response = model.generate_content(prompt)
-        return response.text
+def generate_ai_analysis(df: pd.DataFrame, metrics: dict, date_range: tuple = None) -> str:
+    """Generate AI-powered analysis using Google's Gemini."""
+    try:
+        # Call Gemini API (answers for identical prompts come from the AI cache)
+        return generate_text(menu_analysis_prompt(df, metrics, date_range))
 
     except Exception as e:
         st.error(f"Failed to generate AI analysis: {e}")
         return "AI analysis could not be generated at this time."
 
-def display_ai_analysis(analysis: str) -> None:
-    """Display the AI analysis in a formatted way."""
+def display_ai_analysis(analysis) -> str:
+    """Display the AI analysis (its text, or a stream of text chunks shown as they arrive) and return the full text."""
     st.markdown("---")
     st.markdown("### 🎯 Kush's Investment Banking Level Analysis")
-    st.markdown(analysis)
+    if isinstance(analysis, str):
+        st.markdown(analysis)
+    else:
+        analysis = st.write_stream(analysis)
     st.markdown("---")
+    return analysis
 
 def extract_date_range(filename: str) -> tuple:
     """Extract date range from filename in format YYYYMMDD_YYYYMMDD."""
@@ -80,14 +86,6 @@ def extract_date_range(filename: str) -> tuple:
         st.warning(f"Could not extract date range from filename: {e}")
         return None, None
 
-def find_header_row(df_raw: pd.DataFrame) -> int:
-    """Find the header row in the raw DataFrame."""
-    for i in range(df_raw.shape[0]):
-        non_nan_count = df_raw.iloc[i].dropna().shape[0]
-        if non_nan_count > 3:  # Header should have at least 3 non-empty values
-            return i
-    return -1
-
 def clean_and_rename_columns(df: pd.DataFrame) -> pd.DataFrame:
     """Clean column names and rename them to standard format."""
     # Clean column names
@@ -131,24 +129,24 @@ def display_metrics(metrics: dict, date_range: tuple = None) -> None:
     with col3:
         st.metric("Average Item Price", f"${metrics['avg_price']:,.2f}")
 
-def parse_menu_sales_report(file_path: str) -> pd.DataFrame:
-    """Parse the menu sales analysis Excel file into a pandas DataFrame."""
+def parse_menu_sales_report(file_path: str, with_analysis: bool = True) -> pd.DataFrame:
+    """
+    Parse the menu sales analysis Excel file into a pandas DataFrame.
+    with_analysis=False skips the (blocking) AI analysis so the caller can generate it alongside other sections.
+    """
     try:
         # Extract date range from filename
         filename = Path(file_path).name
         date_range = extract_date_range(filename)
         
-        # Read the Excel file
-        df_raw = pd.read_excel(file_path, sheet_name='Sheet1', header=None, engine='openpyxl')
-        
-        # Find header row
-        header_row_index = find_header_row(df_raw)
+        # Read the Excel file once and find the header row (first row with more than 3 values)
+        df_raw, header_row_index = load_report(file_path, "menu", sheet_name='Sheet1')
         if header_row_index == -1:
             st.error("Could not detect a clear header row in the menu sales report.")
             return pd.DataFrame()
         
-        # Read file with correct header
-        df = pd.read_excel(file_path, sheet_name='Sheet1', header=header_row_index, engine='openpyxl')
+        # Slice the data below the header row
+        df = frame_from_header(df_raw, header_row_index)
         
         # Clean and rename columns
         df = clean_and_rename_columns(df)
@@ -175,10 +173,12 @@ def parse_menu_sales_report(file_path: str) -> pd.DataFrame:
         metrics = calculate_metrics(df)
         display_metrics(metrics, date_range)
         
-        # Generate and display AI analysis
-        if date_range:
-            analysis = generate_ai_analysis(df, metrics, date_range)
-            display_ai_analysis(analysis)
+        # Generate and display AI analysis, streamed as it is written
+        if with_analysis and date_range[0] is not None:
+            try:
+                display_ai_analysis(stream_text(menu_analysis_prompt(df, metrics, date_range)))
+            except Exception as e:
+                st.error(f"Failed to generate AI analysis: {e}")
         
         st.success("Menu sales report parsed successfully!")
         return df
@@ -8,6 +8,7 @@ from dotenv import load_dotenv
 from pathlib import Path
 import re
 from pages.accounting_assistant_page import accounting_assistant_page
+from ai_client import generate_text, stream_text
 
 # Load environment variables
 load_dotenv()
@@ -17,28 +18,27 @@ genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
 st.set_page_config(page_title="Action Plan & Marketing Strategy", layout="wide")
 
-def generate_action_plan(sales_df, menu_df, sales_file_name, menu_file_name):
-    """Generate a comprehensive action plan using AI."""
-    try:
-        # Extract date ranges from filenames
-        sales_date_match = re.search(r'(\d{8})_(\d{8})', sales_file_name)
-        menu_date_match = re.search(r'(\d{8})_(\d{8})', menu_file_name)
-        
-        sales_period = f"{datetime.strptime(sales_date_match.group(1), '%Y%m%d').strftime('%B %d, %Y')} to {datetime.strptime(sales_date_match.group(2), '%Y%m%d').strftime('%B %d, %Y')}"
-        menu_period = f"{datetime.strptime(menu_date_match.group(1), '%Y%m%d').strftime('%B %d, %Y')} to {datetime.strptime(menu_date_match.group(2), '%Y%m%d').strftime('%B %d, %Y')}"
-
-        # Calculate key metrics
-        total_sales = sales_df['Total Sales'].sum() # Assuming 'Total Sales' is now correctly in sales_df
-        avg_daily_sales = sales_df['Total Sales'].mean()
-        total_items_sold = menu_df['Quantity'].sum()
-        avg_item_price = menu_df['Total Sales'].sum() / total_items_sold if total_items_sold > 0 else 0
-
-        # Get top and bottom performing items
-        top_items = menu_df.nlargest(5, 'Total Sales')[['Item Name', 'Quantity', 'Total Sales', 'Price']]
-        bottom_items = menu_df.nsmallest(5, 'Total Sales')[['Item Name', 'Quantity', 'Total Sales', 'Price']]
-
-        # Create prompt for Gemini
-        prompt = f"""As a strategic business consultant specializing in restaurant operations, create a comprehensive action plan and marketing strategy based on the following data:
+def action_plan_prompt(sales_df, menu_df, sales_file_name, menu_file_name):
+    """Gemini prompt for the action plan; raises if a file name has no YYYYMMDD_YYYYMMDD period."""
+    # Extract date ranges from filenames
+    sales_date_match = re.search(r'(\d{8})_(\d{8})', sales_file_name)
+    menu_date_match = re.search(r'(\d{8})_(\d{8})', menu_file_name)
+    
+    sales_period = f"{datetime.strptime(sales_date_match.group(1), '%Y%m%d').strftime('%B %d, %Y')} to {datetime.strptime(sales_date_match.group(2), '%Y%m%d').strftime('%B %d, %Y')}"
+    menu_period = f"{datetime.strptime(menu_date_match.group(1), '%Y%m%d').strftime('%B %d, %Y')} to {datetime.strptime(menu_date_match.group(2), '%Y%m%d').strftime('%B %d, %Y')}"
+
+    # Calculate key metrics
+    total_sales = sales_df['Total Sales'].sum() # Assuming 'Total Sales' is now correctly in sales_df
+    avg_daily_sales = sales_df['Total Sales'].mean()
+    total_items_sold = menu_df['Quantity'].sum()
+    avg_item_price = menu_df['Total Sales'].sum() / total_items_sold if total_items_sold > 0 else 0
+
+    # Get top and bottom performing items
+    top_items = menu_df.nlargest(5, 'Total Sales')[['Item Name', 'Quantity', 'Total Sales', 'Price']]
+    bottom_items = menu_df.nsmallest(5, 'Total Sales')[['Item Name', 'Quantity', 'Total Sales', 'Price']]
+
+    # Create prompt for Gemini
+    return f"""As a strategic business consultant specializing in restaurant operations, create a comprehensive action plan and marketing strategy based on the following data:
 
 Sales Period: {sales_period}
 Menu Analysis Period: {menu_period}
@@ -90,10 +90,11 @@ Please provide a detailed action plan with the following sections:
 
 Format the response in a professional business consulting style with clear sections, bullet points, and actionable recommendations."""
 
-        # Call Gemini API
-        model = genai.GenerativeModel('gemini-1.5-pro-latest')
-        response = model.generate_content(prompt)
-        return response.text
+def generate_action_plan(sales_df, menu_df, sales_file_name, menu_file_name):
+    """Generate a comprehensive action plan using AI."""
+    try:
+        # Call Gemini API (answers for identical prompts come from the AI cache)
+        return generate_text(action_plan_prompt(sales_df, menu_df, sales_file_name, menu_file_name))
 
     except Exception as e:
         st.error(f"Failed to generate action plan: {e}")
@@ -113,22 +114,22 @@ def main():
         st.write(f"Menu Data Columns in Action Plan Page: {menu_df.columns.tolist()}")
 
     if sales_df is not None and sales_file_name is not None and menu_df is not None and menu_file_name is not None:
-        # Generate and display action plan
-        with st.spinner("Generating comprehensive action plan..."):
-            action_plan = generate_action_plan(sales_df, menu_df, sales_file_name, menu_file_name)
-            
-            # Display action plan in a nice format
-            st.markdown("---")
-            st.markdown(action_plan)
-            st.markdown("---")
-
-            # Add download button for the action plan
-            st.download_button(
-                label="📥 Download Action Plan",
-                data=action_plan,
-                file_name="action_plan.txt",
-                mime="text/plain"
-            )
+        # Generate and display action plan, streamed as it is written
+        st.markdown("---")
+        try:
+            action_plan = st.write_stream(stream_text(action_plan_prompt(sales_df, menu_df, sales_file_name, menu_file_name)))
+        except Exception as e:
+            st.error(f"Failed to generate action plan: {e}")
+            action_plan = "Action plan could not be generated at this time."
+        st.markdown("---")
+
+        # Add download button for the action plan (the complete text)
+        st.download_button(
+            label="📥 Download Action Plan",
+            data=action_plan,
+            file_name="action_plan.txt",
+            mime="text/plain"
+        )
     else:
         st.error("Please ensure sales and menu data have been processed and are available in the Sales Dashboard and Menu Analysis pages respectively.")
 
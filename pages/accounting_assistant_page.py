@@ -7,6 +7,7 @@ import google.generativeai as genai
 import re # New import for regex
 import json
 import io # New import for in-memory file operations
+from ai_client import generate_text
 
 genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
@@ -613,9 +614,7 @@ def categorize_transaction(description, amount, check_number, learned_rules, jou
 
         Return ONLY the exact accounting category string. Do not include punctuation or commentary.
         """
-        model = genai.GenerativeModel('gemini-1.5-flash-latest')
-        response = model.generate_content(prompt)
-        category = response.text.strip()
+        category = generate_text(prompt, 'gemini-1.5-flash-latest').strip()
 
         # Double-check: If it's a debit and somehow got categorized as a revenue, reset it
         if not is_credit and category.startswith("Revenue"):
@@ -650,9 +649,7 @@ User Query: {query}
 Provide a concise and insightful answer."""
 
     try:
-        model = genai.GenerativeModel('gemini-1.5-pro-latest')
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        return generate_text(prompt).strip()
     except Exception as e:
         st.error(f"Failed to get AI insight: {e}")
         return "Could not generate insight at this time."
@@ -0,0 +1,86 @@
+"""
+Headless payroll runner: the same pipeline as the Payroll Processor page, without Streamlit.
+
+    python -m payroll run Payroll_20250512_20250525.xlsx        # -> Final_Payroll_Report.xlsx
+    python -m payroll run uploads --output-dir data/reports     # every workbook in a folder
+    python -m payroll run uploads -q                            # errors only (cron)
+    python -m payroll run report.xlsx -v                        # debug output
+
+Prints a per-stage wall-clock timing table after each run unless --quiet is given.
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+from reporters import LogReporter, SilentReporter
+
+
+def _output_path(file_path: Path, output_dir, single: bool) -> Path:
+    if output_dir is None:
+        return Path("Final_Payroll_Report.xlsx") if single else Path("data/reports") / f"Payroll_Report_{file_path.stem}.xlsx"
+    return Path(output_dir) / f"Payroll_Report_{file_path.stem}.xlsx"
+
+
+def format_timings(timings: dict) -> str:
+    total = sum(timings.values())
+    lines = [f"  {name:<14} {seconds * 1000:>9.1f} ms" for name, seconds in timings.items()]
+    lines.append(f"  {'total':<14} {total * 1000:>9.1f} ms")
+    return "\n".join(lines)
+
+
+def run(paths, output_dir=None, make_reporter=SilentReporter) -> list:
+    """
+    Runs app_logic.process_payroll_report on each workbook (folders are expanded to their .xlsx files),
+    with a fresh reporter from `make_reporter` per file. Returns [(path, df, output_path or None, reporter)].
+    """
+    # Imported here so `--help` works without loading the rate book
+    from app_logic import process_payroll_report
+    from payroll_batch import find_payroll_files
+
+    files = find_payroll_files(paths)
+    results = []
+    for file_path in files:
+        reporter = make_reporter()
+        output_path = _output_path(Path(file_path), output_dir, single=len(files) == 1)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        df, written = process_payroll_report(str(file_path), reporter=reporter, output_filename=str(output_path))
+        results.append((str(file_path), df, written, reporter))
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m payroll", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="process payroll workbooks")
+    run_parser.add_argument("paths", nargs="+", help="payroll .xlsx files or folders containing them")
+    run_parser.add_argument("--output-dir", default=None,
+                            help="where reports are written (default: Final_Payroll_Report.xlsx for one file, data/reports/ for several)")
+    verbosity = run_parser.add_mutually_exclusive_group()
+    verbosity.add_argument("-q", "--quiet", action="store_true", help="no output except errors")
+    verbosity.add_argument("-v", "--verbose", action="store_true", help="debug output")
+    args = parser.parse_args(argv)
+
+    level = logging.ERROR if args.quiet else logging.DEBUG if args.verbose else logging.INFO
+    logging.basicConfig(level=level, format="%(levelname)s %(message)s")
+    results = run(args.paths, args.output_dir, LogReporter)
+    if not results:
+        logging.error("No payroll workbooks found in %s", ", ".join(args.paths))
+        return 1
+
+    failed = 0
+    for path, df, written, reporter in results:
+        if written is None:
+            failed += 1
+            logging.error("%s: no payroll data processed", path)
+            continue
+        logging.info("%s: %d employees, total pay $%s -> %s",
+                     path, len(df), f"{df['Total Pay'].sum():,.2f}", written)
+        if not args.quiet:
+            print(format_timings(reporter.timings))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""
+Batch mode: process every payroll workbook in the inbox folders at once.
+
+Finds payroll exports in uploads/, downloads/ and data/inbox/, runs the parse/compute stage
+for each file in a process pool, then writes one report per pay period plus a consolidated
+year-to-date workbook per year.
+
+    python payroll_batch.py                       # default folders -> data/reports/
+    python payroll_batch.py uploads --workers 2
+"""
+import argparse
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from attachment_store import STORE_DIR, attachment_store, content_hash
+from excel_loader import load_report
+from payroll_engine import OUTPUT_COLUMNS, compute_payroll, prepare_payroll_frame
+from report_generator import write_payroll_report
+
+PAYROLL_DIRS = ["uploads", "downloads", "data/inbox"]
+REPORTS_DIR = Path("data/reports")
+
+# Columns summed per employee in the year-to-date workbook
+YTD_SUM_COLUMNS = ["Hours", "Base Pay", "Driver Reim.", "CC Tips", "Cash Tips", "Other Tips", "Total Pay"]
+
+# Footer written by the POS export, e.g. "from 5/12/2025 to 5/25/2025"
+FOOTER_PERIOD_PATTERN = re.compile(r'from\s+(\d{1,2}/\d{1,2}/\d{4})\s+to\s+(\d{1,2}/\d{1,2}/\d{4})')
+
+
+def find_payroll_files(dirs=PAYROLL_DIRS) -> list:
+    """
+    Lists candidate .xlsx workbooks in the given folders (non-recursive, temp/lock files skipped).
+    A folder holding the attachment store also contributes the stored payroll reports.
+    """
+    files = []
+    for folder in dirs:
+        folder = Path(folder)
+        if folder.is_file():
+            files.append(folder)
+        elif folder.is_dir():
+            files.extend(sorted(p for p in folder.glob("*.xlsx") if not p.name.startswith("~$")))
+            if folder.resolve() == STORE_DIR.parent.resolve():
+                files.extend(attachment_store.files("payroll"))
+    return files
+
+
+def payroll_period(file_path, df_raw_initial: pd.DataFrame = None) -> tuple:
+    """
+    Returns the (start, end) dates of a payroll export, from a file name like
+    Payroll_20250512_20250525.xlsx or else from the report's 'from M/D/YYYY to M/D/YYYY' footer.
+    Returns (None, None) if neither is present.
+    """
+    match = re.search(r'(\d{8})_(\d{8})', Path(file_path).name)
+    if match:
+        return datetime.strptime(match.group(1), '%Y%m%d'), datetime.strptime(match.group(2), '%Y%m%d')
+
+    if df_raw_initial is not None:
+        for value in df_raw_initial.tail(5).to_numpy().ravel():
+            match = FOOTER_PERIOD_PATTERN.search(str(value))
+            if match:
+                return datetime.strptime(match.group(1), '%m/%d/%Y'), datetime.strptime(match.group(2), '%m/%d/%Y')
+    return None, None
+
+
+def compute_payroll_file(file_path, id_rates: dict, name_rates: dict, overrides: dict = None):
+    """
+    Parse/compute stage for one workbook, safe to run in a worker process (no Streamlit, no file writes).
+    Returns a dict with path, period, df, auto_rates and file_hash, or None if the file is not a payroll export.
+    """
+    df_raw_initial, header_row_index = load_report(file_path, "payroll")
+    if header_row_index == -1:
+        return None
+    df_raw = prepare_payroll_frame(df_raw_initial, header_row_index)
+    df, auto_rates = compute_payroll(df_raw, id_rates, name_rates, overrides=overrides)
+    start, end = payroll_period(file_path, df_raw_initial)
+    return {"path": str(file_path), "start": start, "end": end, "df": df, "auto_rates": auto_rates,
+            "file_hash": content_hash(file_path)}
+
+
+def _period_label(result: dict) -> str:
+    if result["start"] is None:
+        return Path(result["path"]).stem
+    return f"{result['start']:%Y%m%d}_{result['end']:%Y%m%d}"
+
+
+def build_ytd_frames(results: list) -> tuple:
+    """Returns (summary, detail): per-employee YTD totals and every employee row tagged with its period."""
+    frames = []
+    for result in results:
+        df = result["df"].copy()
+        df.insert(0, "Period End", result["end"])
+        df.insert(0, "Period Start", result["start"])
+        frames.append(df)
+    detail = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["Period Start", "Period End"] + OUTPUT_COLUMNS)
+
+    summary = detail.groupby("ID", as_index=False).agg(
+        Name=("Name", "last"),
+        Periods=("Period End", "nunique"),
+        **{col: (col, "sum") for col in YTD_SUM_COLUMNS},
+    )
+    summary[YTD_SUM_COLUMNS] = summary[YTD_SUM_COLUMNS].round(2)
+    return summary.sort_values("Name").reset_index(drop=True), detail
+
+
+def write_ytd_workbook(results: list, output_path) -> str:
+    """Writes the consolidated year-to-date workbook (YTD Summary + All Periods sheets)."""
+    summary, detail = build_ytd_frames(results)
+    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+        summary.to_excel(writer, index=False, sheet_name='YTD Summary')
+        detail.to_excel(writer, index=False, sheet_name='All Periods')
+    return str(output_path)
+
+
+def run_batch(dirs=PAYROLL_DIRS, output_dir=REPORTS_DIR, max_workers: int = None) -> dict:
+    """
+    Processes every payroll workbook found in `dirs` in a process pool.
+
+    The same export often sits in several folders; only the first copy of each pay period is
+    used. Rates auto-assigned in any period are committed to rates.json once at the end, and
+    every dated period is recorded in the payroll history store.
+    Returns {"periods": [...], "reports": [...], "ytd_reports": [...], "skipped": [...]}.
+    """
+    # Imported here so worker processes do not load the rate book when importing this module
+    from app_logic import reference_rates, payroll_overrides, payroll_history
+
+    files = find_payroll_files(dirs)
+    reference_rates.refresh()
+    id_rates, name_rates = dict(reference_rates.ids), dict(reference_rates.names)
+
+    results, skipped = [], []
+    if files:
+        workers = max_workers or min(len(files), os.cpu_count() or 1)
+        # Spawned, not forked: the app calls this from a threaded server (poller, IMAP and SQLite locks)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(compute_payroll_file, path, id_rates, name_rates, payroll_overrides) for path in files]
+            for path, future in zip(files, futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    skipped.append((str(path), f"error: {e}"))
+                    continue
+                if result is None:
+                    skipped.append((str(path), "not a payroll report"))
+                elif result["df"].empty:
+                    skipped.append((str(path), "no employee rows"))
+                else:
+                    results.append(result)
+
+    # Keep one copy per pay period, in chronological order
+    by_period = {}
+    for result in results:
+        label = _period_label(result)
+        if label in by_period:
+            skipped.append((result["path"], f"duplicate of {by_period[label]['path']}"))
+        else:
+            by_period[label] = result
+    periods = sorted(by_period.values(), key=lambda r: (r["start"] is None, r["start"] or datetime.min))
+
+    for result in periods:
+        reference_rates.assign_many(result["auto_rates"])
+    reference_rates.commit()
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    reports = []
+    for result in periods:
+        report_path = output_dir / f"Payroll_Report_{_period_label(result)}.xlsx"
+        with open(report_path, "wb") as f:
+            f.write(write_payroll_report(result["df"]).getvalue())
+        result["report_path"] = str(report_path)
+        reports.append(str(report_path))
+        if result["start"] is not None:
+            payroll_history.record_period(result["df"], result["start"], result["end"], source=Path(result["path"]).name,
+                                         file_hash=result["file_hash"])
+
+    ytd_reports = []
+    dated = [r for r in periods if r["end"] is not None]
+    for year in sorted({r["end"].year for r in dated}):
+        year_results = [r for r in dated if r["end"].year == year]
+        ytd_reports.append(write_ytd_workbook(year_results, output_dir / f"Payroll_YTD_{year}.xlsx"))
+
+    return {"periods": periods, "reports": reports, "ytd_reports": ytd_reports, "skipped": skipped}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dirs", nargs="*", default=PAYROLL_DIRS, help="folders (or files) to scan for payroll workbooks")
+    parser.add_argument("--output-dir", default=str(REPORTS_DIR), help="where per-period and YTD reports are written")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per file, up to CPU count)")
+    args = parser.parse_args()
+
+    batch = run_batch(args.dirs, args.output_dir, args.workers)
+    for result in batch["periods"]:
+        print(f"{_period_label(result)}: {len(result['df'])} employees, "
+              f"total pay ${result['df']['Total Pay'].sum():,.2f} -> {result['report_path']}")
+    for path in batch["ytd_reports"]:
+        print(f"YTD workbook: {path}")
+    for path, reason in batch["skipped"]:
+        print(f"skipped {path}: {reason}")
+
+
+if __name__ == "__main__":
+    main()
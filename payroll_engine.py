@@ -1,3 +1,260 @@
 # Logic for computing gross, taxes, deductions, net pay
+import hashlib
+import json
+import os
 
-def process_payroll(data): pass
\ No newline at end of file
+import numpy as np
+import pandas as pd
+
+from excel_loader import frame_from_header
+
+# Standardized headers for the OUTPUT DataFrame columns
+OUTPUT_COLUMNS = ["ID", "Name", "Job Description", "Rate", "Hours", "Base Pay",
+                  "Driver Reim.", "CC Tips", "Cash Tips", "Other Tips", "Total Pay"]
+
+# Map the report's column headers to internal, clean names
+INPUT_COLUMN_MAPPING = {
+    "ID": "ID",
+    "Name": "Name",
+    "Job Desc": "Job_Desc",
+    "Rate": "Rate",
+    "Hours": "Hours",
+    "Base Pay": "Base_Pay_Excel",
+    "Driver\nReim": "Driver_Reim",  # Handle newline in column name
+    "CC/\nOther Tips": "CC_Tips_Raw",  # Handle newline in column name
+    "Cash\nTips": "Cash_Tips_Raw",  # Handle newline in column name
+    "Total Tips": "Total_Tips_Raw",
+    "Subtotal": "Subtotal",
+    "Meal Accts": "Meal_Accts",
+    "Total Pay": "Total_Pay_Excel"
+}
+
+# Columns that may be filled in from the ID-less detail row under each employee row
+DETAIL_NUMERIC_COLUMNS = ["Driver_Reim", "CC_Tips_Raw"]
+
+# Per-location payroll overrides. Each rule matches one of
+#   "id": employee ID, "name": employee name (normalized before matching), "job": job description substring
+# and sets any of
+#   "rate"/"hours": replace the computed rate/hours (applied after job defaults)
+#   "base_pay": "rate_x_hours" (always hours * rate) or "zero"
+#   "exclude": never auto-assign a rate or back-solve hours for this employee
+#   "default_rate": (job rules) rate assigned when no rate is known; persisted to rates.json
+# Job rules are tried in order and the first match wins. ID rules take precedence over name rules.
+# A payroll_overrides.json file holding the same list replaces this table (see load_override_rules).
+PAYROLL_OVERRIDES = [
+    {"id": 123, "rate": 10.40, "hours": 40.0, "base_pay": "rate_x_hours"},  # Krish Patel
+    {"id": 110, "rate": 15.00, "hours": 68.0, "base_pay": "rate_x_hours"},  # Sonu Mitha
+    {"id": 4, "base_pay": "zero"},  # Kush Patel
+    {"name": "Kush Patel", "exclude": True},
+    {"name": "Krish Patel", "exclude": True},
+    {"name": "Sonu Mitha", "exclude": True},
+    {"name": "A, Angie", "exclude": True},
+    {"name": "delivery delivery driver", "exclude": True},
+    {"name": "jayesh", "exclude": True},
+    {"job": "support", "default_rate": 15.0},
+    {"job": "server", "default_rate": 9.0},
+]
+
+# Columns of the compiled ID/name override tables
+OVERRIDE_COLUMNS = ["rate", "hours", "base_pay", "exclude"]
+
+
+def normalize_names(names: pd.Series) -> pd.Series:
+    """Vectorized normalize_name for a Series of names (lowercase, no commas, single spaces)."""
+    normalized = names.astype(str).str.lower().str.replace(',', '', regex=False)
+    return normalized.str.split().str.join(' ')
+
+
+def load_override_rules(path=None) -> list:
+    """Returns the override rules from a JSON file if it exists, else the built-in PAYROLL_OVERRIDES."""
+    if path and os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+    return PAYROLL_OVERRIDES
+
+
+def compile_overrides(rules: list, excluded_names=()) -> dict:
+    """
+    Compiles override rules once into lookup tables applied to a whole payroll frame:
+    "by_id"/"by_name" DataFrames (indexed by employee ID / normalized name, OVERRIDE_COLUMNS)
+    and "jobs", the ordered [(lowercase pattern, default rate)] list. Extra excluded_names
+    (already normalized) are added as exclude-only name rules. "version" hashes the rules.
+    """
+    id_rows, name_rows, jobs = {}, {}, []
+    for rule in rules:
+        values = {col: rule.get(col) for col in OVERRIDE_COLUMNS}
+        if "job" in rule:
+            jobs.append((str(rule["job"]).lower(), float(rule["default_rate"])))
+        elif "id" in rule:
+            id_rows[int(rule["id"])] = values
+        elif "name" in rule:
+            name_rows[normalize_names(pd.Series([rule["name"]])).iloc[0]] = values
+    for name in excluded_names:
+        name_rows.setdefault(name, dict.fromkeys(OVERRIDE_COLUMNS))["exclude"] = True
+
+    def table(rows):
+        df = pd.DataFrame.from_dict(rows, orient="index", columns=OVERRIDE_COLUMNS)
+        df[["rate", "hours"]] = df[["rate", "hours"]].astype(float)
+        df["exclude"] = df["exclude"].eq(True)
+        return df
+
+    payload = json.dumps([rules, sorted(excluded_names)], sort_keys=True, default=str)
+    return {
+        "by_id": table(id_rows),
+        "by_name": table(name_rows),
+        "jobs": jobs,
+        "version": hashlib.sha256(payload.encode()).hexdigest(),
+    }
+
+
+def prepare_payroll_frame(df_raw_initial: pd.DataFrame, header_row_index: int) -> pd.DataFrame:
+    """Slices the data rows below the header row and renames the columns to their internal names."""
+    df_raw = frame_from_header(df_raw_initial, header_row_index)
+    df_raw = df_raw.rename(columns=INPUT_COLUMN_MAPPING)
+
+    # Drop any 'Unnamed' columns if they exist and are not needed
+    return df_raw.loc[:, ~df_raw.columns.astype(str).str.contains('^Unnamed')]
+
+
+def _column(df: pd.DataFrame, name: str) -> pd.Series:
+    """Return a column as float, or an all-NaN float column if it is missing."""
+    if name not in df.columns:
+        return pd.Series(np.nan, index=df.index, dtype=float)
+    return pd.to_numeric(df[name], errors='coerce').astype(float)
+
+
+def _text_column(df: pd.DataFrame, name: str) -> pd.Series:
+    """Return a column as stripped strings with NaN preserved."""
+    if name not in df.columns:
+        return pd.Series(np.nan, index=df.index, dtype=object)
+    col = df[name]
+    return col.where(col.isna(), col.astype(str).str.strip())
+
+
+def employee_rows(df_raw: pd.DataFrame) -> tuple:
+    """
+    Returns (is_main, has_detail) masks over df_raw's rows: employee rows (ID and Name present)
+    and, among them, the ones followed by an ID-less detail row.
+    """
+    id_raw = df_raw["ID"]
+    is_main = id_raw.notna() & df_raw["Name"].notna() & pd.to_numeric(id_raw, errors='coerce').notna()
+    has_detail = id_raw.isna().shift(-1, fill_value=False) & is_main
+    return is_main, has_detail
+
+
+def compute_payroll(df_raw: pd.DataFrame, id_rates: dict, name_rates: dict, excluded_names=(), overrides: dict = None) -> tuple:
+    """
+    Computes the payroll output frame from the renamed raw report without a Python row loop.
+
+    Each employee row (ID and Name present) is paired with the ID-less detail row right
+    below it via shift(-1); rate, hours, base pay and tips are then computed with masks.
+    id_rates/name_rates are the RateBook indexes (employee ID -> rate, normalized name -> rate).
+    overrides is a compile_overrides() table (default: PAYROLL_OVERRIDES); excluded_names adds
+    normalized names to its exclusion list.
+    Returns (df_output, auto_rates) where auto_rates maps normalized names to the rates
+    that were assigned from the job description, so the caller can persist them once.
+    """
+    if df_raw.empty or "ID" not in df_raw.columns or "Name" not in df_raw.columns:
+        return pd.DataFrame(columns=OUTPUT_COLUMNS), {}
+
+    df_raw = df_raw.reset_index(drop=True)
+    id_num = pd.to_numeric(df_raw["ID"], errors='coerce')
+    is_main, has_detail = employee_rows(df_raw)
+
+    main = df_raw[is_main]
+    detail_idx = main.index + 1
+    detail = df_raw.reindex(detail_idx).set_axis(main.index)
+    has_detail = has_detail[is_main]
+
+    ids = id_num[is_main].astype(np.int64)
+    names = main["Name"].astype(str).str.strip()
+    normalized = normalize_names(names)
+
+    # Join the override tables onto the employees: ID rules first, then name rules
+    if overrides is None:
+        overrides = DEFAULT_OVERRIDES
+    by_id = overrides["by_id"].reindex(ids.to_numpy()).set_axis(main.index)
+    by_name = overrides["by_name"].reindex(normalized.to_numpy()).set_axis(main.index)
+    override = by_id.combine_first(by_name)
+    excluded = by_id["exclude"].eq(True) | by_name["exclude"].eq(True) | normalized.isin(list(excluded_names))
+
+    # Values from the employee row, overridden by the detail row where it has them
+    job_desc = _text_column(main, "Job_Desc")
+    detail_job = _text_column(detail, "Job_Desc")
+    job_desc = detail_job.where(has_detail & detail_job.notna(), job_desc).fillna("")
+
+    numeric = {}
+    for col in DETAIL_NUMERIC_COLUMNS:
+        main_col = _column(main, col)
+        detail_col = _column(detail, col)
+        numeric[col] = detail_col.where(has_detail & detail_col.notna(), main_col).fillna(0.0)
+    driver_reim = numeric["Driver_Reim"]
+    cc_tips = numeric["CC_Tips_Raw"]
+    cash_tips = _column(main, "Cash_Tips_Raw").fillna(0.0)
+    base_pay_excel = _column(main, "Base_Pay_Excel").fillna(0.0)
+    total_pay_excel = _column(main, "Total_Pay_Excel").fillna(0.0)
+
+    # Hours come from the detail row when there is one (0 if it is blank there)
+    hours = _column(main, "Hours").fillna(0.0)
+    hours = hours.where(~has_detail, _column(detail, "Hours").fillna(0.0))
+
+    # Rate: reference rates by ID, then by normalized name, then the detail row's Rate
+    rate = ids.map(id_rates).astype(float)
+    rate = rate.fillna(normalized.map(name_rates).astype(float)).fillna(0.0)
+    if "Rate" in detail.columns:
+        detail_rate_raw = detail["Rate"]
+        detail_rate = pd.to_numeric(detail_rate_raw, errors='coerce').fillna(0.0)
+        rate = rate.where(~(has_detail & detail_rate_raw.notna()), detail_rate)
+
+    # Auto-assign rates from the job description for unknown, non-excluded employees
+    auto_rates = {}
+    job_lower = job_desc.str.lower()
+    unassigned = (rate == 0) & ~excluded
+    for keyword, default_rate in overrides["jobs"]:
+        assign = unassigned & job_lower.str.contains(keyword, regex=False)
+        rate = rate.mask(assign, default_rate)
+        auto_rates.update(dict.fromkeys(normalized[assign], default_rate))
+        unassigned &= ~assign
+
+    # Fixed rates, hours and base pay rules from the override table
+    rate = override["rate"].fillna(rate)
+    hours = override["hours"].fillna(hours)
+    is_hardcoded = override["base_pay"].eq("rate_x_hours")
+    is_zero_base = override["base_pay"].eq("zero")
+
+    tips_and_reim = cc_tips + cash_tips + driver_reim
+    conditions = [
+        is_hardcoded,
+        is_zero_base,
+        (rate > 0) & (hours > 0),
+        base_pay_excel > 0,
+        (total_pay_excel > 0) & (total_pay_excel >= tips_and_reim),
+    ]
+    choices = [hours * rate, 0.0, hours * rate, base_pay_excel, total_pay_excel - tips_and_reim]
+    base_pay = pd.Series(np.select(conditions, choices, default=0.0), index=main.index)
+
+    # Back-solve hours from base pay for everyone not on the exclusion list
+    backsolve = (rate > 0) & ~excluded
+    hours_calc = (base_pay / rate.where(backsolve, 1.0)).where(backsolve, hours)
+
+    other_tips = cc_tips + cash_tips
+    total_pay = base_pay + other_tips
+
+    df_output = pd.DataFrame({
+        "ID": ids,
+        "Name": names,
+        "Job Description": job_desc,
+        "Rate": rate,
+        "Hours": hours_calc.round(2),
+        "Base Pay": base_pay.round(2),
+        "Driver Reim.": driver_reim.round(2),
+        "CC Tips": cc_tips.round(2),
+        "Cash Tips": cash_tips.round(2),
+        "Other Tips": other_tips.round(2),
+        "Total Pay": total_pay.round(2),
+    }, columns=OUTPUT_COLUMNS).reset_index(drop=True)
+    return df_output, auto_rates
+
+
+# Built-in override table, compiled once at import
+DEFAULT_OVERRIDES = compile_overrides(PAYROLL_OVERRIDES)
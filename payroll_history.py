@@ -0,0 +1,167 @@
+# Pay-period history: every processed payroll kept in a local SQLite store for cross-period queries
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from rate_book import normalize_name
+
+HISTORY_DB = Path("data/payroll_history.sqlite")
+
+# Output column -> history table column
+HISTORY_COLUMNS = {
+    "ID": "emp_id",
+    "Name": "name",
+    "Job Description": "job",
+    "Rate": "rate",
+    "Hours": "hours",
+    "Base Pay": "base_pay",
+    "Driver Reim.": "driver_reim",
+    "CC Tips": "cc_tips",
+    "Cash Tips": "cash_tips",
+    "Other Tips": "other_tips",
+    "Total Pay": "total_pay",
+}
+
+# Amounts summed per employee by ytd_totals()
+SUM_COLUMNS = ["hours", "base_pay", "driver_reim", "cc_tips", "cash_tips", "other_tips", "total_pay"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS periods (
+    period_id INTEGER PRIMARY KEY,
+    period_start TEXT NOT NULL,
+    period_end TEXT NOT NULL,
+    source TEXT,
+    file_hash TEXT,
+    processed_at TEXT NOT NULL,
+    UNIQUE (period_start, period_end)
+);
+CREATE TABLE IF NOT EXISTS payroll_rows (
+    period_id INTEGER NOT NULL REFERENCES periods(period_id) ON DELETE CASCADE,
+    emp_id INTEGER NOT NULL,
+    name TEXT,
+    name_key TEXT,
+    job TEXT,
+    rate REAL, hours REAL, base_pay REAL, driver_reim REAL,
+    cc_tips REAL, cash_tips REAL, other_tips REAL, total_pay REAL
+);
+CREATE INDEX IF NOT EXISTS idx_rows_emp_period ON payroll_rows (emp_id, period_id);
+CREATE INDEX IF NOT EXISTS idx_rows_name_period ON payroll_rows (name_key, period_id);
+CREATE INDEX IF NOT EXISTS idx_rows_period ON payroll_rows (period_id);
+CREATE INDEX IF NOT EXISTS idx_periods_end ON periods (period_end);
+"""
+
+
+def _date(value) -> str:
+    """ISO date string for a datetime/date/'YYYY-MM-DD' value."""
+    if isinstance(value, str):
+        return value[:10]
+    return value.strftime("%Y-%m-%d")
+
+
+class PayrollHistory:
+    """
+    Processed pay periods in SQLite: one `periods` row per (start, end) and one `payroll_rows`
+    row per employee per period, indexed by employee ID, normalized name and period.
+
+    Re-recording a period replaces its rows, so reprocessing a corrected export is safe.
+    Queries return DataFrames using the payroll report's column names.
+    """
+
+    def __init__(self, path=HISTORY_DB):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Connection that commits on success, rolls back on error and is always closed."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA foreign_keys = ON")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _query(self, sql: str, params=()) -> pd.DataFrame:
+        with self._connect() as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def record_period(self, df: pd.DataFrame, start, end, source: str = None, file_hash: str = None) -> int:
+        """Stores one processed pay period (the payroll output frame), replacing any earlier copy. Returns its period_id."""
+        rows = df[list(HISTORY_COLUMNS)].rename(columns=HISTORY_COLUMNS)
+        rows.insert(3, "name_key", rows["name"].map(normalize_name))
+        start, end = _date(start), _date(end)
+
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM periods WHERE period_start = ? AND period_end = ?", (start, end))
+            cursor = conn.execute(
+                "INSERT INTO periods (period_start, period_end, source, file_hash, processed_at) VALUES (?, ?, ?, ?, ?)",
+                (start, end, source, file_hash, datetime.now().isoformat(timespec="seconds")))
+            period_id = cursor.lastrowid
+            rows.insert(0, "period_id", period_id)
+            placeholders = ", ".join("?" * len(rows.columns))
+            conn.executemany(f"INSERT INTO payroll_rows ({', '.join(rows.columns)}) VALUES ({placeholders})",
+                             rows.astype(object).where(rows.notna(), None).itertuples(index=False, name=None))
+        return period_id
+
+    def has_file(self, file_hash: str) -> bool:
+        """True if a workbook with this content hash has already been recorded."""
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM periods WHERE file_hash = ? LIMIT 1", (file_hash,)).fetchone() is not None
+
+    def periods(self) -> pd.DataFrame:
+        """Every recorded period with its employee count and total pay, newest first."""
+        return self._query("""
+            SELECT p.period_start AS "Period Start", p.period_end AS "Period End", COUNT(r.emp_id) AS "Employees",
+                   ROUND(SUM(r.total_pay), 2) AS "Total Pay", p.source AS "Source", p.processed_at AS "Processed"
+            FROM periods p LEFT JOIN payroll_rows r ON r.period_id = p.period_id
+            GROUP BY p.period_id ORDER BY p.period_end DESC""")
+
+    def employees(self) -> pd.DataFrame:
+        """Distinct employees (ID and latest name) seen in any period."""
+        df = self._query("""
+            SELECT r.emp_id AS "ID", r.name AS "Name" FROM payroll_rows r
+            JOIN periods p ON p.period_id = r.period_id ORDER BY p.period_end""")
+        return df.drop_duplicates("ID", keep="last").sort_values("Name").reset_index(drop=True)
+
+    def employee_history(self, emp_id: int = None, name: str = None, last_n: int = None) -> pd.DataFrame:
+        """An employee's rows across periods (by ID, or by name in any 'Last, First' spelling), oldest first."""
+        if emp_id is not None:
+            condition, param = "r.emp_id = ?", int(emp_id)
+        else:
+            condition, param = "r.name_key = ?", normalize_name(name)
+        limit = f"LIMIT {int(last_n)}" if last_n else ""
+        columns = ", ".join(f'r.{col} AS "{label}"' for label, col in HISTORY_COLUMNS.items())
+        df = self._query(f"""
+            SELECT p.period_start AS "Period Start", p.period_end AS "Period End", {columns}
+            FROM payroll_rows r JOIN periods p ON p.period_id = r.period_id
+            WHERE {condition} ORDER BY p.period_end DESC {limit}""", (param,))
+        return df.iloc[::-1].reset_index(drop=True)
+
+    def period_rows(self, start, end) -> pd.DataFrame:
+        """The stored payroll table for one period."""
+        columns = ", ".join(f'r.{col} AS "{label}"' for label, col in HISTORY_COLUMNS.items())
+        return self._query(f"""
+            SELECT {columns} FROM payroll_rows r JOIN periods p ON p.period_id = r.period_id
+            WHERE p.period_start = ? AND p.period_end = ? ORDER BY r.rowid""", (_date(start), _date(end)))
+
+    def ytd_totals(self, year: int) -> pd.DataFrame:
+        """Per-employee totals for pay periods ending in `year`, named as in their latest period."""
+        labels = {col: label for label, col in HISTORY_COLUMNS.items()}
+        sums = ", ".join(f'ROUND(SUM(r.{col}), 2) AS "{labels[col]}"' for col in SUM_COLUMNS)
+        return self._query(f"""
+            WITH year_rows AS (
+                SELECT r.*, FIRST_VALUE(r.name) OVER (
+                    PARTITION BY r.emp_id ORDER BY p.period_end DESC, r.rowid DESC) AS latest_name
+                FROM payroll_rows r JOIN periods p ON p.period_id = r.period_id
+                WHERE p.period_end BETWEEN ? AND ?)
+            SELECT r.emp_id AS "ID", MAX(r.latest_name) AS "Name", COUNT(*) AS "Periods", {sums}
+            FROM year_rows r
+            GROUP BY r.emp_id ORDER BY "Name" """, (f"{year}-01-01", f"{year}-12-31"))
@@ -0,0 +1,149 @@
+# Live payroll model: rate/hours corrections recompute only the affected rows and report cells
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from payroll_engine import DEFAULT_OVERRIDES, OUTPUT_COLUMNS, compute_payroll, employee_rows, normalize_names
+from report_generator import TOTAL_COLUMNS, write_payroll_report
+
+
+class PayrollModel:
+    """
+    A processed payroll kept alongside its raw report rows so corrections are incremental.
+
+    Each output row maps back to its employee row (and ID-less detail row) in `df_raw`.
+    `set_rate`/`set_hours` patch the raw inputs, rerun compute_payroll on just those rows,
+    update `df` and the running `totals` by the difference, and queue the changed cells.
+    `report_bytes()` builds the styled workbook once and afterwards only rewrites queued cells.
+    """
+
+    def __init__(self, df_raw: pd.DataFrame, id_rates: dict, name_rates: dict, overrides: dict = None):
+        self.df_raw = df_raw.reset_index(drop=True).copy()
+        self.id_rates = dict(id_rates)
+        self.name_rates = dict(name_rates)
+        self.overrides = overrides
+        self.df, self.auto_rates = compute_payroll(self.df_raw, self.id_rates, self.name_rates, overrides=overrides)
+        self.totals = self.df[TOTAL_COLUMNS].sum()
+        self.rate_edits = {}  # employee ID -> corrected rate, for persisting to rates.json
+
+        is_main, has_detail = employee_rows(self.df_raw)
+        self.main_rows = np.flatnonzero(is_main.to_numpy())
+        self.has_detail = has_detail[is_main].to_numpy()
+
+        self._workbook = None
+        self._dirty_cells = set()  # (output position, column name) changed since the last report_bytes()
+
+    def positions(self, emp_id: int) -> np.ndarray:
+        """Output row positions of an employee ID."""
+        return np.flatnonzero(self.df["ID"].to_numpy() == int(emp_id))
+
+    def _raw_rows(self, position: int) -> list:
+        main_row = self.main_rows[position]
+        return [main_row, main_row + 1] if self.has_detail[position] else [main_row]
+
+    def _input_row(self, position: int) -> int:
+        """Raw row holding the employee's Rate/Hours inputs (the detail row when there is one)."""
+        return self._raw_rows(position)[-1]
+
+    def _recompute(self, positions) -> list:
+        """Recomputes the given output rows from df_raw. Returns the [(position, column)] cells that changed."""
+        if len(positions) == 0:
+            return []
+        raw_rows = [row for position in positions for row in self._raw_rows(position)]
+        updated, auto_rates = compute_payroll(self.df_raw.iloc[raw_rows], self.id_rates, self.name_rates,
+                                              overrides=self.overrides)
+        self.auto_rates.update(auto_rates)
+        updated.index = self.df.index[positions]
+        previous = self.df.loc[updated.index]
+
+        changed = []
+        for col in OUTPUT_COLUMNS:
+            differs = ~(previous[col].eq(updated[col]) | (previous[col].isna() & updated[col].isna()))
+            changed.extend((int(position), col) for position in updated.index[differs.to_numpy()])
+
+        self.totals += updated[TOTAL_COLUMNS].sum() - previous[TOTAL_COLUMNS].sum()
+        for col in OUTPUT_COLUMNS:
+            self.df.loc[updated.index, col] = updated[col]
+        self._dirty_cells.update(changed)
+        return changed
+
+    def fixed_by_override(self, emp_id: int) -> set:
+        """The inputs ("rate", "hours") the override table fixes for an employee; corrections to them would have no effect."""
+        overrides = self.overrides if self.overrides is not None else DEFAULT_OVERRIDES
+        positions = self.positions(emp_id)
+        if len(positions) == 0:
+            return set()
+        name = normalize_names(self.df["Name"].iloc[positions[:1]]).iloc[0]
+        fixed = set()
+        for table, key in ((overrides["by_id"], int(emp_id)), (overrides["by_name"], name)):
+            if key in table.index:
+                fixed.update(col for col in ("rate", "hours") if pd.notna(table.at[key, col]))
+        return fixed
+
+    def _check_editable(self, emp_id: int, field: str) -> None:
+        if field in self.fixed_by_override(emp_id):
+            raise ValueError(f"The {field} of employee {emp_id} is fixed by the payroll override table; "
+                             f"change the override rule instead.")
+
+    def set_rate(self, emp_id: int, rate: float) -> list:
+        """
+        Corrects an employee's rate (also over a Rate on the report's detail row) and recomputes their rows.
+        Raises ValueError, changing nothing, when the override table fixes the employee's rate.
+        """
+        emp_id, rate = int(emp_id), float(rate)
+        self._check_editable(emp_id, "rate")
+        self.id_rates[emp_id] = rate
+        positions = self.positions(emp_id)
+        if "Rate" in self.df_raw.columns:
+            for position in positions:
+                input_row = self._input_row(position)
+                if self.has_detail[position] and pd.notna(self.df_raw.at[input_row, "Rate"]):
+                    self.df_raw.at[input_row, "Rate"] = rate
+        changed = self._recompute(positions)
+        # Only rates that reached the output are saved to rates.json by commit_rates
+        if any(col == "Rate" for _, col in changed):
+            self.rate_edits[emp_id] = rate
+        return changed
+
+    def set_hours(self, emp_id: int, hours: float) -> list:
+        """
+        Corrects an employee's worked hours for this period and recomputes their rows.
+        Raises ValueError, changing nothing, when the override table fixes the employee's hours.
+        """
+        self._check_editable(emp_id, "hours")
+        positions = self.positions(emp_id)
+        if "Hours" not in self.df_raw.columns:
+            self.df_raw["Hours"] = np.nan
+        for position in positions:
+            self.df_raw.at[self._input_row(position), "Hours"] = float(hours)
+        return self._recompute(positions)
+
+    def report_bytes(self) -> bytes:
+        """The styled payroll workbook; after the first call only cells changed since then are rewritten."""
+        if self._workbook is None:
+            self._workbook = load_workbook(write_payroll_report(self.df))
+            self._dirty_cells.clear()
+        else:
+            ws = self._workbook.active
+            columns = {name: idx for idx, name in enumerate(self.df.columns, 1)}
+            for position, col in sorted(self._dirty_cells):
+                # Total Pay cells hold '=Base Pay+Other Tips' formulas and the totals row sums; both update themselves
+                if col == "Total Pay":
+                    continue
+                value = self.df.iat[position, columns[col] - 1]
+                ws.cell(row=position + 2, column=columns[col]).value = None if pd.isna(value) else value
+            self._dirty_cells.clear()
+
+        output = BytesIO()
+        self._workbook.save(output)
+        return output.getvalue()
+
+    def commit_rates(self, rate_book) -> bool:
+        """Saves corrected ID rates and any new auto-assigned rates to a RateBook in one write."""
+        for emp_id, rate in self.rate_edits.items():
+            rate_book.assign_id(emp_id, rate)
+        rate_book.assign_many(self.auto_rates)
+        self.rate_edits.clear()
+        return rate_book.commit()
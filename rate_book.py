@@ -0,0 +1,137 @@
+# Reference pay rates by employee ID and by normalized name, backed by rates.json
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+
+def normalize_name(name: str) -> str:
+    """Normalizes an employee name for consistent comparison (lowercase, no commas, single spaces)."""
+    if not isinstance(name, str):
+        return ""
+    name = name.lower().replace(',', '')
+    return ' '.join(name.split())
+
+
+class RateBook:
+    """
+    Reference rates kept in two indexes: `ids` (int employee ID -> rate) and `names`
+    (normalized name -> rate).
+
+    Rates auto-assigned during a payroll run are buffered with `assign()` and written in one
+    atomic replace by `commit()`. `refresh()` reloads the file only when its mtime/size changed,
+    so a long-lived Streamlit process picks up rate edits made outside of it.
+    """
+
+    def __init__(self, path, default_rates: dict = None):
+        self.path = Path(path) if path else None
+        self.default_rates = default_rates or {}
+        self.ids = {}
+        self.names = {}
+        self.pending = {}
+        self.pending_ids = {}
+        self._stamp = None
+        self._lock = threading.RLock()
+        self.refresh()
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except (OSError, TypeError):
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self, raw_rates: dict):
+        ids, names = {}, {}
+        for key, rate in raw_rates.items():
+            if isinstance(key, int) or (isinstance(key, str) and key.strip().isdigit()):
+                ids[int(key)] = float(rate)
+            else:
+                names[normalize_name(key)] = float(rate)
+        self.ids, self.names = ids, names
+
+    def refresh(self) -> bool:
+        """Reloads rates from disk if the file changed since the last load. Returns True if reloaded."""
+        with self._lock:
+            stamp = self._file_stamp()
+            if stamp is not None and stamp == self._stamp:
+                return False
+            if stamp is None:
+                # No rates file yet: start from the defaults and create it
+                self._load(self.default_rates)
+                if self.path:
+                    self._write()
+            else:
+                with open(self.path, 'r') as f:
+                    self._load(json.load(f))
+                self._stamp = stamp
+            # Assigned rates that have not been committed yet still apply
+            self.names.update(self.pending)
+            self.ids.update(self.pending_ids)
+            return True
+
+    @property
+    def version(self) -> str:
+        """Content hash of the rate table; changes whenever any rate changes."""
+        with self._lock:
+            table = {"ids": sorted(self.ids.items()), "names": sorted(self.names.items())}
+        return hashlib.sha256(json.dumps(table).encode()).hexdigest()
+
+    def get(self, emp_id=None, name=None, default=0.0) -> float:
+        """Looks up a rate by employee ID, then by (normalized) name."""
+        if emp_id is not None and emp_id in self.ids:
+            return self.ids[emp_id]
+        return self.names.get(normalize_name(name), default)
+
+    def assign(self, name: str, rate: float):
+        """Buffers an auto-assigned rate for a name; it is used immediately and saved on commit()."""
+        with self._lock:
+            key = normalize_name(name)
+            self.names[key] = float(rate)
+            self.pending[key] = float(rate)
+
+    def assign_id(self, emp_id: int, rate: float):
+        """Buffers a rate for an employee ID (e.g. a manual correction); saved on commit()."""
+        with self._lock:
+            self.ids[int(emp_id)] = float(rate)
+            self.pending_ids[int(emp_id)] = float(rate)
+
+    def assign_many(self, rates_by_name: dict):
+        """Buffers several auto-assigned rates (normalized name -> rate)."""
+        for name, rate in rates_by_name.items():
+            self.assign(name, rate)
+
+    def commit(self) -> bool:
+        """Writes buffered rates to disk in one atomic write. Returns True if anything was written."""
+        with self._lock:
+            if not (self.pending or self.pending_ids) or not self.path:
+                return False
+            # Merge into the latest file contents so edits made elsewhere are not overwritten
+            pending, pending_ids = dict(self.pending), dict(self.pending_ids)
+            self.refresh()
+            self.names.update(pending)
+            self.ids.update(pending_ids)
+            self._write()
+            self.pending.clear()
+            self.pending_ids.clear()
+            return True
+
+    def _write(self):
+        """Atomically replaces the rates file with the current indexes."""
+        rates = {str(k): v for k, v in self.ids.items()}
+        rates.update(self.names)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        mode = os.stat(self.path).st_mode & 0o777 if self.path.exists() else 0o644
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(rates, f, indent=4)
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._stamp = self._file_stamp()
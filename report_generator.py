@@ -1,3 +1,106 @@
 # Generates Excel and PDF reports
+from io import BytesIO
 
-def generate_report(): pass
\ No newline at end of file
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Border, Side, Alignment, NamedStyle
+from openpyxl.utils import get_column_letter
+
+# Rows converted from the DataFrame at a time while streaming a report
+ROW_CHUNK_SIZE = 2000
+
+# Output columns summed in the report's totals row and the live model's running totals
+TOTAL_COLUMNS = ["Hours", "Base Pay", "Driver Reim.", "CC Tips", "Cash Tips", "Other Tips", "Total Pay"]
+
+
+def _payroll_styles() -> dict:
+    """Named styles shared by every cell of the payroll report (registered once per workbook)."""
+    thin = Side(style='thin')
+    medium = Side(style='medium')
+    left = Alignment(horizontal='left')
+    return {
+        "header": NamedStyle(name="payroll_header", font=Font(name='Arial', size=11, bold=True), alignment=left,
+                             border=Border(left=thin, right=thin, top=thin, bottom=medium)),
+        "body": NamedStyle(name="payroll_body", font=Font(name='Arial', size=11), alignment=left,
+                           border=Border(left=thin, right=thin, top=thin, bottom=thin)),
+        "total": NamedStyle(name="payroll_total", font=Font(name='Arial', size=11, bold=True), alignment=left,
+                            border=Border(left=thin, right=thin, top=medium, bottom=thin)),
+    }
+
+
+def column_widths(df: pd.DataFrame) -> list:
+    """Autofit widths (longest string + 2) for each column, computed per column instead of per cell."""
+    widths = []
+    for col in df.columns:
+        lengths = df[col].astype(str).str.len()
+        longest = max(len(str(col)), int(lengths.max()) if len(lengths) else 0)
+        widths.append(longest + 2)
+    return widths
+
+
+def write_payroll_report(df: pd.DataFrame, sheet_title: str = "Payroll Report") -> BytesIO:
+    """
+    Writes the payroll DataFrame as a styled workbook in openpyxl write-only mode.
+
+    The first row is the header and every DataFrame row is a body row with a live
+    '=Base Pay+Other Tips' formula in the Total Pay column. A bold totals row with
+    '=SUM(...)' formulas over the TOTAL_COLUMNS present is appended below the data.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_title)
+    for style in _payroll_styles().values():
+        wb.add_named_style(style)
+
+    headers = list(df.columns)
+    letters = {name: get_column_letter(idx) for idx, name in enumerate(headers, 1)}
+    has_formula = all(name in letters for name in ("Base Pay", "Other Tips", "Total Pay"))
+    total_pay_idx = headers.index("Total Pay") if has_formula else None
+    last_row = len(df) + 1
+
+    totals = [None] * len(headers)
+    if len(df):
+        totals[0] = "Total"
+        for name in TOTAL_COLUMNS:
+            if name in letters:
+                totals[headers.index(name)] = f'=SUM({letters[name]}2:{letters[name]}{last_row})'
+
+    # Column widths must be set before any rows are streamed
+    widths = column_widths(df)
+    if has_formula:
+        # The Total Pay cells hold formulas like '=F12+J12'; the last one is the longest
+        longest_formula = f'={letters["Base Pay"]}{last_row}+{letters["Other Tips"]}{last_row}'
+        widths[total_pay_idx] = max(widths[total_pay_idx], len(longest_formula) + 2)
+    for idx, value in enumerate(totals):
+        if value is not None:
+            widths[idx] = max(widths[idx], len(value) + 2)
+    for idx, width in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(idx)].width = width
+
+    def styled_row(values, style_name):
+        row = []
+        for value in values:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.style = style_name
+            row.append(cell)
+        return row
+
+    ws.append(styled_row(headers, "payroll_header"))
+
+    # Convert rows to Python values in chunks so the whole frame is never boxed at once
+    row_idx = 2
+    for start in range(0, len(df), ROW_CHUNK_SIZE):
+        chunk = df.iloc[start:start + ROW_CHUNK_SIZE]
+        for row_values in chunk.astype(object).where(chunk.notna(), None).values.tolist():
+            if has_formula:
+                row_values[total_pay_idx] = f'={letters["Base Pay"]}{row_idx}+{letters["Other Tips"]}{row_idx}'
+            ws.append(styled_row(row_values, "payroll_body"))
+            row_idx += 1
+
+    if len(df):
+        ws.append(styled_row(totals, "payroll_total"))
+
+    output = BytesIO()
+    wb.save(output)
+    output.seek(0)
+    return output
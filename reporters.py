@@ -0,0 +1,88 @@
+# Progress/diagnostic reporters for the payroll pipeline (Streamlit UI, logging, or silent)
+import logging
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("payroll")
+
+
+class Reporter:
+    """
+    Sink for pipeline messages plus per-stage wall-clock timings.
+
+    The pipeline calls debug/info/warning/error and wraps each step in `stage(name)`;
+    subclasses decide where messages go. Timings are collected in `timings` (stage -> seconds)
+    regardless of the output, so headless runs can print them at the end.
+    """
+
+    def __init__(self):
+        self.timings = {}
+
+    def debug(self, message: str):
+        pass
+
+    def info(self, message: str):
+        pass
+
+    def warning(self, message: str):
+        pass
+
+    def error(self, message: str):
+        pass
+
+    def debug_enabled(self) -> bool:
+        """False when debug output is dropped, so callers can skip building expensive messages."""
+        return False
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed
+            self.debug(f"{name}: {elapsed * 1000:.1f} ms")
+
+
+class SilentReporter(Reporter):
+    """Drops every message; only stage timings are kept."""
+
+
+class LogReporter(Reporter):
+    """Sends messages to the 'payroll' logger at the matching level."""
+
+    def __init__(self, log=logger):
+        super().__init__()
+        self.log = log
+
+    def debug(self, message: str):
+        self.log.debug(message)
+
+    def info(self, message: str):
+        self.log.info(message)
+
+    def warning(self, message: str):
+        self.log.warning(message)
+
+    def error(self, message: str):
+        self.log.error(message)
+
+    def debug_enabled(self) -> bool:
+        return self.log.isEnabledFor(logging.DEBUG)
+
+
+class StreamlitReporter(LogReporter):
+    """Shows info/warnings/errors in the Streamlit page; debug output goes to the log only."""
+
+    def info(self, message: str):
+        import streamlit as st
+        st.write(message)
+
+    def warning(self, message: str):
+        import streamlit as st
+        st.warning(message)
+
+    def error(self, message: str):
+        import streamlit as st
+        st.error(message)
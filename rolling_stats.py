@@ -0,0 +1,125 @@
+# Running daily-sales statistics updated in constant time per appended day, with anomaly flags
+import math
+from collections import deque
+
+import pandas as pd
+
+ANOMALY_SETTINGS = {
+    "trend_days": 7,          # trailing window of the moving average
+    "baseline_weeks": 12,     # same-weekday days kept in each weekday baseline
+    "min_baseline_days": 4,   # a weekday needs this many earlier days before its days are judged
+    "z_threshold": 3.5,       # |z| against the weekday baseline at or above which a day is flagged
+    "min_std_fraction": 0.02, # spread floor as a fraction of the baseline mean, so a flat baseline still judges
+}
+
+
+class RollingWindow:
+    """Mean and variance of the last `size` values, kept as running sums so each push is O(1)."""
+
+    def __init__(self, size: int):
+        self.values = deque(maxlen=size)
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def push(self, value: float) -> None:
+        if len(self.values) == self.values.maxlen:
+            old = self.values[0]
+            self.total -= old
+            self.total_sq -= old * old
+        self.values.append(value)
+        self.total += value
+        self.total_sq += value * value
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def mean(self) -> float:
+        return self.total / len(self.values) if self.values else 0.0
+
+    @property
+    def std(self) -> float:
+        """Sample standard deviation (0 with fewer than two values)."""
+        n = len(self.values)
+        if n < 2:
+            return 0.0
+        return math.sqrt(max((self.total_sq - self.total * self.total / n) / (n - 1), 0.0))
+
+    def z_score(self, value: float, min_std: float = 0.0) -> float:
+        std = max(self.std, min_std)
+        return (value - self.mean) / std if std > 0 else 0.0
+
+
+class DailySalesMonitor:
+    """
+    Rolling statistics over a daily sales series that only ever grows at the end.
+
+    `append` takes one day and, in constant time, updates the trailing moving average and the
+    per-weekday baselines of sales and Labor %. Each day is scored against its weekday baseline
+    as it stood *before* that day, so an outlier cannot hide itself. Flagged days are kept in
+    `anomalies`. The monitor pickles cleanly, so a saved one resumes where it stopped.
+    """
+
+    def __init__(self, settings: dict = None):
+        self.settings = dict(ANOMALY_SETTINGS, **(settings or {}))
+        self.trend = RollingWindow(self.settings["trend_days"])
+        self.sales_baseline = [RollingWindow(self.settings["baseline_weeks"]) for _ in range(7)]
+        self.labor_baseline = [RollingWindow(self.settings["baseline_weeks"]) for _ in range(7)]
+        self.last_date = None
+        self.days = 0
+        self.anomalies = []
+        self.last_report_id = 0  # newest sales-history report folded in (see sales_handler.refresh_sales_monitor)
+
+    def append(self, date, sales: float, labor_percent: float) -> dict:
+        """
+        Adds the day after `last_date` (later dates only; a gap is fine) and returns its statistics:
+        7-day average, weekday baseline means, z-scores and whether sales or Labor % was flagged.
+        """
+        date = pd.Timestamp(date).normalize()
+        if self.last_date is not None and date <= self.last_date:
+            raise ValueError(f"{date:%Y-%m-%d} is not after the last appended day {self.last_date:%Y-%m-%d}")
+        weekday = date.dayofweek
+        sales_base, labor_base = self.sales_baseline[weekday], self.labor_baseline[weekday]
+
+        judged = len(sales_base) >= self.settings["min_baseline_days"]
+        floor = self.settings["min_std_fraction"]
+        sales_z = sales_base.z_score(sales, floor * abs(sales_base.mean)) if judged else 0.0
+        labor_z = labor_base.z_score(labor_percent, floor * abs(labor_base.mean)) if judged else 0.0
+        threshold = self.settings["z_threshold"]
+        result = {
+            "Date": date,
+            "Total Sales": sales,
+            "Labor %": labor_percent,
+            "Weekday Avg Sales": sales_base.mean,
+            "Weekday Avg Labor %": labor_base.mean,
+            "Sales z": sales_z,
+            "Labor % z": labor_z,
+            "Sales Flag": abs(sales_z) >= threshold,
+            "Labor Flag": abs(labor_z) >= threshold,
+        }
+
+        self.trend.push(sales)
+        sales_base.push(sales)
+        labor_base.push(labor_percent)
+        result["7d MA"] = self.trend.mean
+        self.last_date = date
+        self.days += 1
+        if result["Sales Flag"] or result["Labor Flag"]:
+            self.anomalies.append(result)
+        return result
+
+    def extend(self, daily: pd.DataFrame) -> int:
+        """Appends the rows of a frame with Date, Total Sales and optional Labor Cost that are newer than `last_date`. Returns days added."""
+        if self.last_date is not None:
+            daily = daily[daily["Date"] > self.last_date]
+        labor_cost = daily["Labor Cost"] if "Labor Cost" in daily.columns else pd.Series(0.0, index=daily.index)
+        for date, sales, labor in zip(daily["Date"], daily["Total Sales"].fillna(0.0), labor_cost.fillna(0.0)):
+            self.append(date, float(sales), float(labor) / sales * 100 if sales > 0 else 0.0)
+        return len(daily)
+
+    def anomalies_frame(self) -> pd.DataFrame:
+        """Flagged days, newest first."""
+        columns = ["Date", "Total Sales", "Weekday Avg Sales", "Sales z", "Labor %", "Weekday Avg Labor %", "Labor % z"]
+        if not self.anomalies:
+            return pd.DataFrame(columns=columns)
+        return pd.DataFrame(self.anomalies)[columns].iloc[::-1].reset_index(drop=True)
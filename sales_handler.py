@@ -0,0 +1,222 @@
+# Parsing and derived metrics for the History Sales Overview report (Sales Dashboard)
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from attachment_store import content_hash
+from disk_cache import CACHE_ROOT, DiskCache
+from excel_loader import frame_from_header, load_report
+from rolling_stats import DailySalesMonitor
+from sales_history import SalesHistory
+from utils import bytes_sha256
+
+# Map the report's column headers (newlines already replaced by spaces) to dashboard names
+SALES_COLUMN_MAPPING = {
+    'Total Sales': 'Total Sales',
+    'Total\nSales': 'Total Sales',
+    'Del Chg': 'Delivery Charges',
+    'Labor': 'Labor Hours',  # Renamed 'Labor' to 'Labor Hours'
+    'Unnamed: 30': 'Labor Cost',  # Explicitly map 'Unnamed: 30' to 'Labor Cost'
+    'Unnamed: 31': 'Labor %',  # Explicitly map 'Unnamed: 31' to 'Labor %'
+    'Cash & Carry': 'Cash & Carry',
+    'Pickup': 'Pickup',
+    'Delivery': 'Delivery',
+    'Liable Taxes': 'Taxable Sales',
+    'Non Liable Taxes': 'Non-Taxable Sales',
+    'Voids': 'Voids Amount',
+    'Chk\nCnt': 'Transaction Count',
+    'Check Cnt': 'Transaction Count'
+}
+
+# Mapped columns coerced to numbers (blank/invalid -> 0)
+SALES_NUMERIC_COLUMNS = ['Total Sales', 'Labor Cost', 'Labor %', 'Cash & Carry', 'Pickup', 'Delivery',
+                         'Delivery Charges', 'Taxable Sales', 'Non-Taxable Sales', 'Voids Amount', 'Transaction Count']
+
+# Summed per day/week/month in the metrics cube (those present in the report)
+CUBE_SUM_COLUMNS = ['Total Sales', 'Labor Cost', 'Cash & Carry', 'Pickup', 'Delivery', 'Table',
+                    'Delivery Charges', 'Voids Amount', 'Transaction Count']
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Parsed sales models keyed by workbook SHA-256: a few in memory (shared by every session of
+# this process) and the rest on disk. Bump the version when parse_sales_report's output changes.
+SALES_MODEL_VERSION = 2
+SALES_MEMORY_ENTRIES = 8
+sales_cache = DiskCache(CACHE_ROOT / "sales", max_bytes=100 * 2 ** 20)
+_recent_models = OrderedDict()
+_recent_lock = threading.Lock()
+
+# Every imported report's days, merged into one daily time series
+sales_history = SalesHistory()
+
+# Rolling statistics/anomaly monitor over each sales history database, saved between runs
+monitor_cache = DiskCache(CACHE_ROOT / "rolling", max_bytes=20 * 2 ** 20)
+
+
+def parse_sales_report(file_path) -> dict:
+    """
+    Parses a History Sales Overview workbook into the dashboard's daily frame.
+    Returns {"df", "total_labor_cost", "avg_labor_percent", "cube"}; the labor totals come from the
+    report's 'Total' row and "cube" is build_sales_cube(df).
+    Raises ValueError if no 'Date' header row is found.
+    """
+    # Dynamic header detection: 'Date' header between row 6 and 15, from the cached parse of the workbook
+    df_raw, header_row_index = load_report(file_path, "sales")
+    if header_row_index == -1:
+        raise ValueError("Could not detect header row containing 'Date' column. Please check the Excel file.")
+
+    df = frame_from_header(df_raw, header_row_index)
+    df.columns = [str(col).replace("\n", " ").strip() for col in df.columns]  # Clean column names
+    df = df.rename(columns=SALES_COLUMN_MAPPING)
+
+    # Total Labor Cost and Labor % come from the last 'Total' row, before it is filtered out
+    total_labor_cost = 0.0
+    avg_labor_percent = 0.0
+    total_rows = df[df["Date"].astype(str).str.strip() == "Total"]
+    if not total_rows.empty:
+        if 'Labor Cost' in total_rows.columns:
+            total_labor_cost = pd.to_numeric(total_rows['Labor Cost'], errors='coerce').fillna(0.0).iloc[-1]
+        if 'Labor %' in total_rows.columns:
+            avg_labor_percent = pd.to_numeric(total_rows['Labor %'], errors='coerce').fillna(0.0).iloc[-1]
+
+    df = df.dropna(how="all").copy()
+
+    # Filter out rows that contain 'Total' in the 'Date' column (summary rows) for daily calculations
+    df = df[~df["Date"].astype(str).str.contains("Total", case=False, na=False)]
+    df["Date"] = pd.to_datetime(df["Date"], errors='coerce')
+    df = df[df["Date"].notna()].sort_values("Date")
+
+    for col in SALES_NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+
+    # Calculate additional metrics (for daily data only)
+    df['7d MA'] = df["Total Sales"].rolling(window=7, min_periods=1).mean()
+    df['Day'] = df['Date'].dt.day_name()
+    df['Month'] = df['Date'].dt.month_name()
+
+    # Daily Labor Percentage
+    df['Labor %'] = labor_percent(df['Labor Cost'], df['Total Sales'])
+
+    return {"df": df, "total_labor_cost": float(total_labor_cost), "avg_labor_percent": float(avg_labor_percent),
+            "cube": build_sales_cube(df, total_labor_cost, avg_labor_percent)}
+
+
+def labor_percent(labor_cost: pd.Series, total_sales: pd.Series) -> pd.Series:
+    """Labor cost as a percentage of sales, 0 where there were no sales."""
+    sales = total_sales.to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percent = np.where(sales > 0, labor_cost.to_numpy(dtype=float) / sales * 100, 0.0)
+    return pd.Series(percent, index=total_sales.index)
+
+
+def _period_totals(grouped) -> pd.DataFrame:
+    """Sums per period plus day count, average daily sales and labor % of the period's sales."""
+    totals = grouped.sum()
+    totals.insert(0, "Days", grouped.size())
+    totals["Avg Daily Sales"] = totals["Total Sales"] / totals["Days"]
+    totals["Labor %"] = labor_percent(totals["Labor Cost"], totals["Total Sales"])
+    return totals
+
+
+def build_sales_cube(df: pd.DataFrame, total_labor_cost: float = 0.0, avg_labor_percent: float = 0.0) -> dict:
+    """
+    Precomputes everything the dashboard shows, once per dataset:
+    "daily"/"week"/"month" totals (indexed by date / week start / month start), "weekday"
+    averages (Monday..Sunday), "order_types" (columns present) and the "kpis" dict.
+    """
+    columns = [col for col in CUBE_SUM_COLUMNS if col in df.columns]
+    values = df[columns].apply(pd.to_numeric, errors='coerce').fillna(0.0)
+    if "Labor Cost" not in values.columns:
+        values["Labor Cost"] = 0.0
+    dates = df["Date"]
+
+    daily = _period_totals(values.groupby(dates))
+    daily["7d MA"] = daily["Total Sales"].rolling(window=7, min_periods=1).mean()
+    week = _period_totals(values.groupby(dates.dt.to_period("W-SUN").dt.start_time.rename("Week")))
+    month = _period_totals(values.groupby(dates.dt.to_period("M").dt.start_time.rename("Month")))
+
+    daily_values = daily.drop(columns=["Days", "Avg Daily Sales", "7d MA"])
+    weekday = daily_values.groupby(daily.index.day_name()).mean().reindex(WEEKDAYS)
+
+    kpis = {
+        "total_sales": float(df["Total Sales"].sum()),
+        "avg_daily_sales": float(df["Total Sales"].mean()) if len(df) else 0.0,
+        "total_labor_cost": float(total_labor_cost),
+        "avg_labor_percent": float(avg_labor_percent),
+        "total_voids": float(df["Voids Amount"].sum()) if "Voids Amount" in df.columns else 0.0,
+        "avg_delivery_charge": float(df["Delivery Charges"].mean()) if "Delivery Charges" in df.columns and len(df) else 0.0,
+        "best_day": None, "best_sales": 0.0, "worst_day": None, "worst_sales": 0.0,
+    }
+    if not daily.empty:
+        kpis.update(best_day=daily["Total Sales"].idxmax(), best_sales=float(daily["Total Sales"].max()),
+                    worst_day=daily["Total Sales"].idxmin(), worst_sales=float(daily["Total Sales"].min()))
+
+    order_types = [col for col in ['Cash & Carry', 'Pickup', 'Delivery', 'Table'] if col in df.columns]
+    return {"daily": daily, "week": week, "month": month, "weekday": weekday, "order_types": order_types, "kpis": kpis}
+
+
+def load_sales_report(file_path) -> dict:
+    """
+    parse_sales_report memoized by the workbook's content hash, so Streamlit reruns and other
+    sessions reuse the parsed frame. The result also carries "file_hash"; treat it as read-only.
+    """
+    file_hash = content_hash(file_path)
+    key = f"{file_hash}-v{SALES_MODEL_VERSION}"
+
+    with _recent_lock:
+        model = _recent_models.get(key)
+        if model is not None:
+            _recent_models.move_to_end(key)
+            return model
+
+    model = sales_cache.get(key)
+    if model is None:
+        model = parse_sales_report(file_path)
+        model["file_hash"] = file_hash
+        sales_cache.set(key, model)
+
+    with _recent_lock:
+        _recent_models[key] = model
+        while len(_recent_models) > SALES_MEMORY_ENTRIES:
+            _recent_models.popitem(last=False)
+    return model
+
+
+def record_sales_history(model: dict, source: str = None) -> int:
+    """Adds a loaded report's days to the sales history unless this workbook was already ingested. Returns days written."""
+    if sales_history.has_file(model["file_hash"]):
+        return 0
+    return sales_history.record_report(model["df"], source=source, file_hash=model["file_hash"])
+
+
+def history_cube(start=None, end=None) -> dict:
+    """build_sales_cube over the stored daily history between start and end (inclusive)."""
+    df = sales_history.daily(start, end)
+    total_labor_cost = float(df["Labor Cost"].sum()) if "Labor Cost" in df.columns else 0.0
+    total_sales = float(df["Total Sales"].sum())
+    labor_pct = total_labor_cost / total_sales * 100 if total_sales > 0 else 0.0
+    return build_sales_cube(df, total_labor_cost, labor_pct)
+
+
+def refresh_sales_monitor(history: SalesHistory = None) -> DailySalesMonitor:
+    """
+    The saved DailySalesMonitor of a sales history (default: the app's) brought up to date: only days
+    after the monitor's last day are appended. If a newer report rewrote days the monitor had
+    already seen, the monitor is rebuilt from the full history once.
+    """
+    history = history or sales_history
+    key = bytes_sha256(str(history.path.resolve()).encode())
+    monitor = monitor_cache.get(key) or DailySalesMonitor()
+
+    changed_from, newest_report = history.changes_since(monitor.last_report_id)
+    if changed_from is None:
+        return monitor
+    if monitor.last_date is not None and changed_from <= monitor.last_date:
+        monitor = DailySalesMonitor()
+    start = monitor.last_date + pd.Timedelta(days=1) if monitor.last_date is not None else None
+    monitor.extend(history.daily(start))
+    monitor.last_report_id = newest_report
+    monitor_cache.set(key, monitor)
+    return monitor
@@ -0,0 +1,136 @@
+# Daily sales history: every imported History Sales Overview report merged into one SQLite time series
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+SALES_HISTORY_DB = Path("data/sales_history.sqlite")
+
+# Dashboard column -> history table column (the daily amounts kept per date)
+SALES_HISTORY_COLUMNS = {
+    "Total Sales": "total_sales",
+    "Labor Cost": "labor_cost",
+    "Cash & Carry": "cash_carry",
+    "Pickup": "pickup",
+    "Delivery": "delivery",
+    "Table": "table_sales",
+    "Delivery Charges": "delivery_charges",
+    "Taxable Sales": "taxable_sales",
+    "Non-Taxable Sales": "non_taxable_sales",
+    "Voids Amount": "voids",
+    "Transaction Count": "transactions",
+}
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS reports (
+    report_id INTEGER PRIMARY KEY,
+    first_date TEXT NOT NULL,
+    last_date TEXT NOT NULL,
+    source TEXT,
+    file_hash TEXT UNIQUE,
+    ingested_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS daily_sales (
+    date TEXT PRIMARY KEY,
+    report_id INTEGER REFERENCES reports(report_id),
+    {", ".join(f"{col} REAL" for col in SALES_HISTORY_COLUMNS.values())}
+);
+"""
+
+
+class SalesHistory:
+    """
+    One row per business day across every imported sales report, keyed by date.
+
+    Reports are appended as they arrive; where exports overlap, the most recently ingested
+    report's numbers replace the stored ones for those dates. Columns missing from a report
+    are stored as NULL. Queries return frames using the dashboard's column names.
+    """
+
+    def __init__(self, path=SALES_HISTORY_DB):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Connection that commits on success, rolls back on error and is always closed."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def record_report(self, df: pd.DataFrame, source: str = None, file_hash: str = None) -> int:
+        """Upserts a parsed sales frame's daily rows (by Date). Returns the number of days written."""
+        days = df[df["Date"].notna()]
+        if days.empty:
+            return 0
+        rows = pd.DataFrame({"date": days["Date"].dt.strftime("%Y-%m-%d")})
+        for label, col in SALES_HISTORY_COLUMNS.items():
+            rows[col] = days[label] if label in days.columns else None
+        rows = rows.drop_duplicates("date", keep="last")
+
+        with self._lock, self._connect() as conn:
+            if file_hash is not None:
+                conn.execute("DELETE FROM reports WHERE file_hash = ?", (file_hash,))
+            cursor = conn.execute(
+                "INSERT INTO reports (first_date, last_date, source, file_hash, ingested_at) VALUES (?, ?, ?, ?, ?)",
+                (rows["date"].min(), rows["date"].max(), source, file_hash, datetime.now().isoformat(timespec="seconds")))
+            rows.insert(1, "report_id", cursor.lastrowid)
+            placeholders = ", ".join("?" * len(rows.columns))
+            conn.executemany(f"INSERT OR REPLACE INTO daily_sales ({', '.join(rows.columns)}) VALUES ({placeholders})",
+                             rows.astype(object).where(rows.notna(), None).itertuples(index=False, name=None))
+        return len(rows)
+
+    def has_file(self, file_hash: str) -> bool:
+        """True if a workbook with this content hash has already been ingested."""
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM reports WHERE file_hash = ? LIMIT 1", (file_hash,)).fetchone() is not None
+
+    def date_range(self) -> tuple:
+        """(first, last) stored date as Timestamps, or (None, None) when the store is empty."""
+        with self._connect() as conn:
+            first, last = conn.execute("SELECT MIN(date), MAX(date) FROM daily_sales").fetchone()
+        return (pd.Timestamp(first), pd.Timestamp(last)) if first else (None, None)
+
+    def changes_since(self, report_id: int) -> tuple:
+        """(earliest date written by reports newer than report_id or None, newest report_id)."""
+        with self._connect() as conn:
+            first, newest = conn.execute(
+                "SELECT MIN(date), (SELECT MAX(report_id) FROM reports) FROM daily_sales WHERE report_id > ?",
+                (report_id,)).fetchone()
+        return (pd.Timestamp(first) if first else None), (newest or 0)
+
+    def reports(self) -> pd.DataFrame:
+        """Every ingested report with its date span and the days it still supplies, newest first."""
+        with self._connect() as conn:
+            return pd.read_sql_query("""
+                SELECT r.first_date AS "First Day", r.last_date AS "Last Day", COUNT(d.date) AS "Days Kept",
+                       r.source AS "Source", r.ingested_at AS "Ingested"
+                FROM reports r LEFT JOIN daily_sales d ON d.report_id = r.report_id
+                GROUP BY r.report_id ORDER BY r.ingested_at DESC, r.report_id DESC""", conn)
+
+    def daily(self, start=None, end=None) -> pd.DataFrame:
+        """Stored days between start and end (inclusive, either open), oldest first, with a datetime 'Date' column."""
+        conditions, params = [], []
+        if start is not None:
+            conditions.append("date >= ?")
+            params.append(pd.Timestamp(start).strftime("%Y-%m-%d"))
+        if end is not None:
+            conditions.append("date <= ?")
+            params.append(pd.Timestamp(end).strftime("%Y-%m-%d"))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        columns = ", ".join(f'{col} AS "{label}"' for label, col in SALES_HISTORY_COLUMNS.items())
+        with self._connect() as conn:
+            df = pd.read_sql_query(f'SELECT date AS "Date", {columns} FROM daily_sales {where} ORDER BY date', conn, params=params)
+        df["Date"] = pd.to_datetime(df["Date"])
+        # Drop amounts no stored report carried (e.g. a 'Table' column the exports never had)
+        never_reported = [col for col in df.columns[2:] if df[col].isna().all()] if not df.empty else []
+        return df.drop(columns=never_reported)
@@ -2,7 +2,7 @@ import os
 import pandas as pd
 from datetime import datetime
 from pathlib import Path
-from email_handler import download_attachment_by_filename_or_subject
+from email_handler import download_latest_report
 import streamlit as st # Import streamlit for st.info and st.error
 import google.generativeai as genai # Import genai
 import io # Import io for string operations
@@ -10,14 +10,22 @@ from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 from io import BytesIO
+from excel_loader import load_report, read_sheet
+from ai_client import generate_text
 
 def download_latest_employee_schedule():
     """Downloads the latest employee schedule Excel file from email."""
     st.info("Attempting to download latest employee schedule...")
-    filter_text = "ROSATI'S EMPLOYEE SCHEDULE"
-    download_path = download_attachment_by_filename_or_subject(filter_text, allowed_extensions=(".xlsx",))
+    try:
+        # Newest mail with ROSATI'S EMPLOYEE SCHEDULE in its subject or attachment name, from the mailbox index
+        download_path, _ = download_latest_report("schedule")
+    except Exception as e:
+        st.error(f"Error fetching email with filter 'ROSATI'S EMPLOYEE SCHEDULE': {str(e)}")
+        return None
     if download_path:
         st.success(f"Downloaded schedule: {os.path.basename(download_path)}")
+    else:
+        st.warning("No .xlsx attachment found with 'ROSATI'S EMPLOYEE SCHEDULE' in subject or filename.")
     return download_path
 
 def parse_employee_schedule(file_path):
@@ -27,19 +35,9 @@ def parse_employee_schedule(file_path):
         return pd.DataFrame()
 
     try:
-        full_df_raw = pd.read_excel(file_path, engine='openpyxl', header=None)
-
-        header_row_index = -1
-        days_of_week_keywords = ["MON", "TUES", "WED", "THURS", "FRI", "SAT", "SUN"]
+        # Read the sheet once; the header row is the first one with at least 3 day names
+        full_df_raw, header_row_index = load_report(file_path, "schedule")
 
-        # Find the header row by looking for days of the week
-        for r_idx in range(full_df_raw.shape[0]):
-            row_values = [str(cell).strip().upper() for cell in full_df_raw.iloc[r_idx].dropna().tolist()]
-            # Check if a significant number of day keywords are present in the row
-            if sum(1 for day_keyword in days_of_week_keywords if day_keyword in row_values) >= 3:
-                header_row_index = r_idx
-                break
-        
         if header_row_index == -1:
             st.error("Could not detect schedule header row. Ensure day names (Mon, Tue, etc.) are present.")
             return pd.DataFrame()
@@ -127,9 +125,7 @@ def generate_ai_schedule_changes(current_df: pd.DataFrame, user_prompt: str) ->
         Make sure the header row is identical to the input CSV.
         """
 
-        model = genai.GenerativeModel('gemini-1.5-pro-latest')
-        response = model.generate_content(prompt)
-        ai_response_text = response.text.strip()
+        ai_response_text = generate_text(prompt).strip()
 
         # Attempt to parse the AI's response back into a DataFrame
         try:
@@ -155,7 +151,7 @@ def generate_formatted_excel_schedule(df: pd.DataFrame, file_path: str) -> Bytes
     ws.title = "Employee Schedule"
 
     # Read the raw Excel to get the dates for the header
-    raw_excel_data = pd.read_excel(file_path, engine='openpyxl', header=None)
+    raw_excel_data = read_sheet(file_path)
 
     # --- Title Section ---
     ws.merge_cells('A1:H2')
@@ -0,0 +1,26 @@
+import pandas as pd
+
+from payroll_history import HISTORY_COLUMNS, PayrollHistory
+
+
+def period(rows):
+    """Payroll output frame with the history columns for (ID, name, hours, total pay) rows."""
+    df = pd.DataFrame(0.0, index=range(len(rows)), columns=list(HISTORY_COLUMNS))
+    df[["ID", "Name", "Hours", "Total Pay"]] = pd.DataFrame(rows).values
+    df["Job Description"] = "Cook"
+    return df.astype({"ID": int, "Hours": float, "Total Pay": float})
+
+
+def test_ytd_totals_name_comes_from_latest_period(tmp_path):
+    history = PayrollHistory(tmp_path / "history.sqlite")
+    # Recorded out of order: the latest period by end date is February, not the last one stored
+    history.record_period(period([(5, "Adams, Ann", 8.0, 100.0)]), "2025-02-01", "2025-02-28")
+    history.record_period(period([(5, "Zimmer, Ann", 10.0, 120.0), (6, "Doe, Jane", 4.0, 50.0)]),
+                          "2025-01-01", "2025-01-31")
+
+    totals = history.ytd_totals(2025).set_index("ID")
+
+    assert totals.loc[5, "Name"] == "Adams, Ann"
+    assert totals.loc[5, "Periods"] == 2
+    assert totals.loc[5, "Total Pay"] == 220.0
+    assert totals.loc[6, "Name"] == "Doe, Jane"
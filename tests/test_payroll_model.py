@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from payroll_engine import DEFAULT_OVERRIDES, compile_overrides
+from payroll_model import PayrollModel
+
+
+def raw_report(rows):
+    """Renamed raw payroll frame with one ID row plus a detail row (job, hours) per employee."""
+    records = []
+    for emp_id, name, job, hours in rows:
+        records.append({"ID": float(emp_id), "Name": name, "Job_Desc": np.nan, "Rate": np.nan, "Hours": np.nan,
+                        "Base_Pay_Excel": 0.0, "Driver_Reim": 0.0, "CC_Tips_Raw": 10.0, "Cash_Tips_Raw": 0.0,
+                        "Total_Pay_Excel": 10.0})
+        records.append({"ID": np.nan, "Name": np.nan, "Job_Desc": job, "Rate": np.nan, "Hours": hours,
+                        "Base_Pay_Excel": np.nan, "Driver_Reim": np.nan, "CC_Tips_Raw": np.nan,
+                        "Cash_Tips_Raw": np.nan, "Total_Pay_Excel": np.nan})
+    return pd.DataFrame(records)
+
+
+class RecordingRateBook:
+    def __init__(self):
+        self.ids = {}
+
+    def assign_id(self, emp_id, rate):
+        self.ids[emp_id] = rate
+
+    def assign_many(self, rates):
+        pass
+
+    def commit(self):
+        return bool(self.ids)
+
+
+@pytest.fixture
+def model():
+    # 123 has a fixed rate and hours in the built-in override table; 7 has no rule
+    return PayrollModel(raw_report([(123, "Patel, Krish", "Cook", 20.0), (7, "Doe, Jane", "Cook", 10.0)]),
+                        {7: 12.0}, {}, DEFAULT_OVERRIDES)
+
+
+def test_rate_correction_recomputes_and_is_saved(model):
+    changed = model.set_rate(7, 14.0)
+
+    row = model.df.iloc[model.positions(7)[0]]
+    assert row["Rate"] == 14.0 and row["Base Pay"] == pytest.approx(140.0)
+    assert (int(model.positions(7)[0]), "Rate") in changed
+    book = RecordingRateBook()
+    model.commit_rates(book)
+    assert book.ids == {7: 14.0}
+
+
+def test_corrections_fixed_by_override_are_refused(model):
+    before = model.df.copy()
+
+    assert model.fixed_by_override(123) == {"rate", "hours"}
+    with pytest.raises(ValueError, match="override"):
+        model.set_rate(123, 20.0)
+    with pytest.raises(ValueError, match="override"):
+        model.set_hours(123, 10.0)
+
+    pd.testing.assert_frame_equal(model.df, before)
+    book = RecordingRateBook()
+    assert model.commit_rates(book) is False and book.ids == {}
+
+
+def test_name_rule_fixes_only_its_fields():
+    overrides = compile_overrides([{"name": "Doe, Jane", "hours": 30.0}])
+    model = PayrollModel(raw_report([(7, "Doe, Jane", "Cook", 10.0)]), {7: 12.0}, {}, overrides)
+
+    assert model.fixed_by_override(7) == {"hours"}
+    with pytest.raises(ValueError):
+        model.set_hours(7, 5.0)
+    model.set_rate(7, 13.0)
+    assert model.df.iloc[0]["Base Pay"] == pytest.approx(13.0 * 30.0)
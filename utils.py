@@ -1,3 +1,16 @@
 # Helper functions for formatting, validation
+import hashlib
 
-def clean_data(): pass
\ No newline at end of file
+def clean_data(): pass
+
+def file_sha256(file_path, chunk_size: int = 1 << 20) -> str:
+    """Returns the SHA-256 hex digest of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def bytes_sha256(data: bytes) -> str:
+    """Returns the SHA-256 hex digest of an in-memory payload."""
+    return hashlib.sha256(data).hexdigest()